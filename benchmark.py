@@ -0,0 +1,381 @@
+"""Benchmarks for the search algorithms in search.py.
+
+Runs searches directly on SearchSpace objects, without the Game loop:
+
+> python benchmark.py batching
+> python benchmark.py parallel
+> python benchmark.py suite --output results.json --baseline baseline.json
+
+The suite runs every algorithm (with every heuristic that applies) on the
+search, corners and maze layouts in layouts/ (as food search problems), the
+single-dot maze layouts (as position search problems, the grid problems
+jump point search needs) and the eight-puzzle examples, each case in its own
+process with a time limit, and records expansions, wall time, peak RSS and
+solution cost to JSON. Given a baseline from an earlier run it lists the
+cases that got worse by more than the tolerance and exits with status 1.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+import zzz_layout
+import zzz_pacman
+from eightpuzzle import EightPuzzleSearchSpace, example_eight_puzzles
+from food import PacmanFoodSearchSpace
+from heuristics import (
+    eight_puzzle_heuristic,
+    eight_puzzle_linear_conflict,
+    eight_puzzle_manhattan,
+    food_heuristic,
+    food_heuristic_mst,
+)
+from search import (
+    SearchBudgetExceeded,
+    a_star_search,
+    anytime_a_star_search,
+    beam_search,
+    bidirectional_search,
+    breadth_first_search,
+    depth_first_search,
+    ida_star_search,
+    iterative_deepening_search,
+    jump_point_search,
+    parallel_a_star_search,
+    portfolio_search,
+    run_with_statistics,
+    sma_star_search,
+    uniform_cost_search,
+    undo_pruning,
+)
+from zzz_searchAgents import PositionSearchProblem, convert_original_game_state, euclideanHeuristic, manhattanHeuristic
+
+
+LAYOUT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts")
+
+
+def load_game_state(layout_name):
+    layout = zzz_layout.getLayout(layout_name)
+    if layout is None:
+        raise ValueError(f"layout {layout_name} cannot be found")
+    state = zzz_pacman.GameState()
+    state.initialize(layout, 0)
+    return state
+
+
+def load_food_space(layout_name):
+    return PacmanFoodSearchSpace(convert_original_game_state(load_game_state(layout_name)))
+
+
+def load_position_space(layout_name):
+    """A PositionSearchProblem from Pacman to the layout's only dot."""
+    state = load_game_state(layout_name)
+    food = state.getFood().asList()
+    if len(food) != 1:
+        raise ValueError(f"layout {layout_name} has {len(food)} dots, not one")
+    return PositionSearchProblem(state, goal=food[0], warn=False, visualize=False)
+
+
+def compare_batching(batch_sizes=(1, 16, 64, 256)):
+    """Nodes/sec of breadth-first search with and without get_successors_batch."""
+    spaces = [
+        ("eightpuzzle depth 10", EightPuzzleSearchSpace(example_eight_puzzles[10])),
+        ("smallSearch", load_food_space("smallSearch")),
+        ("trickySearch", load_food_space("trickySearch")),
+    ]
+    print(f"{'space':<22}{'batch':>7}{'expanded':>10}{'seconds':>9}{'nodes/sec':>11}")
+    for name, space in spaces:
+        for batch_size in batch_sizes:
+            result = run_with_statistics(breadth_first_search, space, batch_size=batch_size)
+            stats = result.statistics
+            print(f"{name:<22}{batch_size:>7}{stats.expanded:>10}{stats.elapsed:>9.2f}{stats.nodes_per_second:>11.0f}")
+
+
+def parallel_scaling(layout_name="trickySearch", heuristic=food_heuristic, max_workers=None):
+    """Wall time and speedup of parallel_a_star_search for 1, 2, 4, ... workers."""
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+    space = load_food_space(layout_name)
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    print(f"{'workers':>7}{'cost':>6}{'expanded':>10}{'seconds':>9}{'speedup':>9}")
+    baseline = None
+    for workers in worker_counts:
+        result = run_with_statistics(parallel_a_star_search, space, heuristic, workers=workers)
+        stats = result.statistics
+        if baseline is None:
+            baseline = stats.elapsed
+        print(f"{workers:>7}{result.cost:>6}{stats.expanded:>10}{stats.elapsed:>9.2f}{baseline / stats.elapsed:>9.2f}")
+
+
+# Layouts of the suite, matched in layouts/: every search layout plus the corners and maze layouts
+SUITE_LAYOUT_PATTERNS = ("*[Ss]earch*.lay", "*Corners*.lay", "*Maze*.lay")
+
+
+def suite_layouts(directory=LAYOUT_DIRECTORY):
+    """Names of the layouts in directory matching SUITE_LAYOUT_PATTERNS, sorted."""
+    names = set()
+    for pattern in SUITE_LAYOUT_PATTERNS:
+        names.update(os.path.basename(path)[: -len(".lay")] for path in glob.glob(os.path.join(directory, pattern)))
+    return sorted(names)
+
+
+SUITE_LAYOUTS = suite_layouts()
+
+# Layouts of the suite that are also searched as position problems: the maze layouts with a single dot
+SUITE_MAZE_PATTERN = "*Maze*.lay"
+
+
+def suite_maze_layouts(directory=LAYOUT_DIRECTORY):
+    """Names of the layouts in directory matching SUITE_MAZE_PATTERN that have exactly one dot, sorted."""
+    names = []
+    for path in sorted(glob.glob(os.path.join(directory, SUITE_MAZE_PATTERN))):
+        with open(path) as f:
+            if f.read().count(".") == 1:
+                names.append(os.path.basename(path)[: -len(".lay")])
+    return names
+
+
+SUITE_MAZE_LAYOUTS = suite_maze_layouts()
+
+SUITE_PUZZLE_DEPTHS = list(range(len(example_eight_puzzles)))
+
+# Heuristics by kind of space
+SUITE_HEURISTICS = {
+    "food": {"farthest": food_heuristic, "mst": food_heuristic_mst},
+    "maze": {"manhattan": manhattanHeuristic, "euclidean": euclideanHeuristic},
+    "eightpuzzle": {
+        "misplaced": eight_puzzle_heuristic,
+        "manhattan": eight_puzzle_manhattan,
+        "linear-conflict": eight_puzzle_linear_conflict,
+    },
+}
+
+# Move pruning rule of each kind of space, filled in for the "prune" argument of SUITE_ALGORITHMS. Undoing
+# a move only returns to the previous state in the puzzle and the maze: Pacman stepping back after eating is a
+# new state.
+SUITE_PRUNING = {"food": None, "maze": undo_pruning, "eightpuzzle": undo_pruning}
+
+# name -> (search function, extra keyword arguments, uses a heuristic, required space attributes). Every search
+# function in search.py is here; cases whose space lacks a required attribute are skipped, which limits jps to
+# the maze (position search) problems. anytime has an expansion budget rather than a deadline so that its
+# expansion counts can be compared between runs.
+SUITE_ALGORITHMS = {
+    "dfs": (depth_first_search, {}, False, ()),
+    "bfs": (breadth_first_search, {}, False, ()),
+    "ucs": (uniform_cost_search, {}, False, ()),
+    "iddfs": (iterative_deepening_search, {"prune": None}, False, ()),
+    "bidirectional": (bidirectional_search, {}, False, ("get_predecessors", "get_goal_states")),
+    "astar": (a_star_search, {}, True, ()),
+    "anytime": (anytime_a_star_search, {"max_nodes": 100000}, True, ()),
+    "ida": (ida_star_search, {"prune": None}, True, ()),
+    "hda": (parallel_a_star_search, {}, True, ()),
+    "beam": (beam_search, {"width": 256}, True, ()),
+    "sma": (sma_star_search, {"max_nodes": 20000}, True, ()),
+    "jps": (jump_point_search, {}, True, ("walls", "get_goal_states", "has_uniform_cost")),
+    "portfolio": (portfolio_search, {}, True, ()),
+}
+
+# Relative slack allowed on each measurement before it counts as a regression
+DEFAULT_TOLERANCES = {"expanded": 0.0, "seconds": 0.25, "search_rss_kb": 0.25}
+
+# Increases smaller than this are measurement noise, never a regression
+NOISE_FLOORS = {"seconds": 0.05, "search_rss_kb": 4096}
+
+
+def suite_spaces(layouts=None, depths=None):
+    """(name, kind, loader) for every space in the suite."""
+    spaces = []
+    for layout_name in SUITE_LAYOUTS if layouts is None else layouts:
+        spaces.append((layout_name, "food", lambda layout_name=layout_name: load_food_space(layout_name)))
+    for layout_name in SUITE_MAZE_LAYOUTS if layouts is None else [name for name in layouts if name in SUITE_MAZE_LAYOUTS]:
+        spaces.append((f"{layout_name}-position", "maze", lambda layout_name=layout_name: load_position_space(layout_name)))
+    for depth in SUITE_PUZZLE_DEPTHS if depths is None else depths:
+        spaces.append((f"eightpuzzle-{depth}", "eightpuzzle", lambda depth=depth: EightPuzzleSearchSpace(example_eight_puzzles[depth])))
+    return spaces
+
+
+def suite_cases(layouts=None, depths=None, algorithms=None):
+    """(space name, kind, loader, algorithm name, heuristic name) for every case in the suite."""
+    cases = []
+    for space_name, kind, loader in suite_spaces(layouts, depths):
+        for algorithm in SUITE_ALGORITHMS if algorithms is None else algorithms:
+            uses_heuristic = SUITE_ALGORITHMS[algorithm][2]
+            for heuristic in SUITE_HEURISTICS[kind] if uses_heuristic else [None]:
+                cases.append((space_name, kind, loader, algorithm, heuristic))
+    return cases
+
+
+def _max_rss_kb():
+    """Peak resident set size of this process and its finished children, in kilobytes."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    scale = 1024 if sys.platform == "darwin" else 1
+    return max(own, children) // scale
+
+
+def _run_case(connection, kind, loader, algorithm, heuristic):
+    """Runs one case in a child process and sends its measurements back."""
+    try:
+        space = loader()
+        search_fn, kwargs, uses_heuristic, required = SUITE_ALGORITHMS[algorithm]
+        missing = [name for name in required if not hasattr(space, name)]
+        if missing:
+            connection.send({"status": "skipped", "reason": f"space lacks {', '.join(missing)}"})
+            return
+        if uses_heuristic:
+            kwargs = dict(kwargs, heuristic=SUITE_HEURISTICS[kind][heuristic])
+        if "prune" in kwargs:
+            kwargs = dict(kwargs, prune=SUITE_PRUNING[kind])
+        rss_before = _max_rss_kb()
+        try:
+            result = run_with_statistics(search_fn, space, **kwargs)
+        except SearchBudgetExceeded as stopped:
+            connection.send({"status": "over budget", "expanded": stopped.expanded})
+            return
+        peak = _max_rss_kb()
+        connection.send(
+            {
+                "status": "ok" if result.found else "no solution",
+                "expanded": result.statistics.expanded,
+                "generated": result.statistics.generated,
+                "saved_pushes": result.statistics.saved_pushes,
+                "seconds": result.statistics.elapsed,
+                "peak_rss_kb": peak,
+                "search_rss_kb": peak - rss_before,
+                "cost": result.cost,
+            }
+        )
+    except Exception as error:
+        connection.send({"status": "error", "reason": f"{type(error).__name__}: {error}"})
+    finally:
+        connection.close()
+
+
+def run_case(kind, loader, algorithm, heuristic, timeout):
+    """Runs one case in a forked process, killing it after timeout seconds."""
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case, args=(sender, kind, loader, algorithm, heuristic))
+    started = time.perf_counter()
+    process.start()
+    sender.close()
+    if receiver.poll(timeout):
+        try:
+            measurement = receiver.recv()
+        except EOFError:
+            measurement = {"status": "error", "reason": f"worker exited with code {process.exitcode}"}
+    else:
+        measurement = {"status": "timeout", "seconds": time.perf_counter() - started}
+    process.kill()
+    process.join()
+    receiver.close()
+    return measurement
+
+
+def run_suite(layouts=None, depths=None, algorithms=None, timeout=60.0, verbose=True):
+    """Runs the suite and returns its report as a JSON-ready dict."""
+    results = []
+    if verbose:
+        print(f"{'space':<26}{'algorithm':<14}{'heuristic':<17}{'status':<12}{'expanded':>10}{'seconds':>9}{'rss MB':>8}{'cost':>6}")
+    for space_name, kind, loader, algorithm, heuristic in suite_cases(layouts, depths, algorithms):
+        measurement = run_case(kind, loader, algorithm, heuristic, timeout)
+        result = {"space": space_name, "algorithm": algorithm, "heuristic": heuristic}
+        result.update(measurement)
+        results.append(result)
+        if verbose:
+            rss = result.get("peak_rss_kb")
+            print(
+                f"{space_name:<26}{algorithm:<14}{heuristic or '-':<17}{result['status']:<12}"
+                f"{result.get('expanded', ''):>10}{result.get('seconds', 0):>9.2f}"
+                f"{'' if rss is None else f'{rss / 1024:.0f}':>8}{'' if result.get('cost') is None else result['cost']:>6}"
+            )
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timeout": timeout,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def _case_key(result):
+    return (result["space"], result["algorithm"], result["heuristic"])
+
+
+def compare_to_baseline(report, baseline, tolerances=None):
+    """Lists (case, description) for every result worse than its baseline beyond the tolerance.
+
+    A case regresses when it no longer finishes, when its solution cost
+    changes, or when expansions, wall time or memory growth exceed the
+    baseline by more than the relative tolerance for that measurement.
+    """
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    previous = {_case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(_case_key(result))
+        if old is None or old["status"] not in ("ok", "no solution"):
+            continue
+        case = "/".join(part for part in _case_key(result) if part)
+        if result["status"] != old["status"]:
+            regressions.append((case, f"status {old['status']} -> {result['status']}"))
+            continue
+        if result.get("cost") != old.get("cost"):
+            regressions.append((case, f"cost {old.get('cost')} -> {result.get('cost')}"))
+        for measure, tolerance in tolerances.items():
+            before, after = old.get(measure), result.get(measure)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before >= NOISE_FLOORS.get(measure, 0):
+                regressions.append((case, f"{measure} {before:.6g} -> {after:.6g}"))
+    return regressions
+
+
+def suite(layouts=None, depths=None, algorithms=None, timeout=60.0, output=None, baseline=None, tolerances=None):
+    report = run_suite(layouts, depths, algorithms, timeout)
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline is None:
+        return 0
+    with open(baseline) as f:
+        regressions = compare_to_baseline(report, json.load(f), tolerances)
+    for case, description in regressions:
+        print(f"REGRESSION {case}: {description}")
+    if not regressions:
+        print(f"No regressions against {baseline}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search benchmarks")
+    parser.add_argument("benchmark", choices=["batching", "parallel", "suite"], help="Which benchmark to run")
+    parser.add_argument("--layout", default="trickySearch", help="Food layout for the parallel benchmark")
+    parser.add_argument("--workers", type=int, default=None, help="Largest worker count for the parallel benchmark")
+    parser.add_argument("--layouts", nargs="*", default=None, help="Food layouts for the suite (default: all)")
+    parser.add_argument("--depths", nargs="*", type=int, default=None, help="Eight-puzzle depths for the suite (default: all)")
+    parser.add_argument("--algorithms", nargs="*", choices=sorted(SUITE_ALGORITHMS), default=None, help="Algorithms for the suite (default: all)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds allowed per suite case")
+    parser.add_argument("--output", default=None, help="JSON file to write the suite results to")
+    parser.add_argument("--baseline", default=None, help="Suite results to compare against")
+    parser.add_argument("--tolerance", type=float, default=None, help="Relative slack on wall time and memory")
+    args = parser.parse_args()
+    if args.benchmark == "batching":
+        compare_batching()
+    elif args.benchmark == "parallel":
+        parallel_scaling(args.layout, max_workers=args.workers)
+    elif args.benchmark == "suite":
+        tolerances = None if args.tolerance is None else {"seconds": args.tolerance, "search_rss_kb": args.tolerance}
+        sys.exit(suite(args.layouts, args.depths, args.algorithms, args.timeout, args.output, args.baseline, tolerances))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Checkpoint and resume for search_template.
+
+A SearchCheckpoint passed to any of the search functions in search.py
+snapshots the frontier, closed set, node arena and statistics to disk every
+`every_nodes` expansions and/or `every_seconds` seconds. Calling the same
+search again with the same checkpoint path resumes from the last snapshot:
+
+    checkpoint = SearchCheckpoint("bfs.ckpt", every_seconds=60)
+    actions = breadth_first_search(space, checkpoint=checkpoint)
+
+The file is a small binary container of tagged sections. States are stored
+as their encode() integers when the space provides an encoding, and pickled
+otherwise.
+"""
+import os
+import pickle
+import struct
+import time
+from array import array
+from queue import LifoQueue, Queue
+
+from search import BitSet, IndexedPriorityQueue, ObserverGroup, SearchStatistics
+
+MAGIC = b"SRCHCKPT"
+VERSION = 1
+_SECTION_HEADER = struct.Struct("<4sQ")
+
+# SearchStatistics counters carried over to the resumed search
+_STATISTICS_FIELDS = (
+    "expanded",
+    "generated",
+    "duplicate_pops",
+    "peak_frontier",
+    "successor_time",
+    "heuristic_time",
+)
+
+
+def _pack_ints(values):
+    """Packs non-negative ints as 8-byte words when they fit, or as fixed-width little-endian bytes."""
+    largest = max(values, default=0)
+    if largest < 1 << 64:
+        return b"\x08" + array("Q", values).tobytes()
+    width = (largest.bit_length() + 7) // 8
+    return bytes([0]) + struct.pack("<I", width) + b"".join(value.to_bytes(width, "little") for value in values)
+
+
+def _unpack_ints(payload):
+    if payload[0] == 8:
+        values = array("Q")
+        values.frombytes(payload[1:])
+        return values.tolist()
+    (width,) = struct.unpack_from("<I", payload, 1)
+    data = payload[5:]
+    return [int.from_bytes(data[i : i + width], "little") for i in range(0, len(data), width)]
+
+
+def _float_array(values):
+    return array("d", values).tobytes()
+
+
+def _floats(payload):
+    values = array("d")
+    values.frombytes(payload)
+    return [int(value) if value.is_integer() else value for value in values]
+
+
+def _statistics(observer):
+    """Finds the SearchStatistics among the observers, if any."""
+    if isinstance(observer, SearchStatistics):
+        return observer
+    if isinstance(observer, ObserverGroup):
+        for member in observer.observers:
+            found = _statistics(member)
+            if found is not None:
+                return found
+    return None
+
+
+class SearchCheckpoint:
+    """Periodic on-disk snapshots of a running search_template search.
+
+    Parameters
+    ----------
+    path : str
+        File to write snapshots to (and resume from, if it exists)
+    every_nodes : int or None
+        Snapshot after every this many expansions
+    every_seconds : float or None
+        Snapshot at least this often
+    resume : bool
+        Whether an existing snapshot at path is resumed rather than ignored
+    keep : bool
+        Whether to keep the snapshot once the search has finished
+    """
+
+    def __init__(self, path, every_nodes=None, every_seconds=None, resume=True, keep=False):
+        if every_nodes is None and every_seconds is None:
+            raise ValueError("a checkpoint needs every_nodes or every_seconds")
+        self.path = path
+        self.every_nodes = every_nodes
+        self.every_seconds = every_seconds
+        self.resume = resume
+        self.keep = keep
+        self.saves = 0
+        self._last_nodes = 0
+        self._last_time = time.monotonic()
+
+    def due(self, expanded):
+        """Whether a snapshot should be written now, after `expanded` expansions."""
+        if expanded == self._last_nodes:
+            return False
+        if self.every_nodes is not None and expanded - self._last_nodes >= self.every_nodes:
+            return True
+        # The clock is only read every 64 expansions.
+        if self.every_seconds is not None and expanded & 63 == 0:
+            return time.monotonic() - self._last_time >= self.every_seconds
+        return False
+
+    def save(self, space, container, visited, arena, expanded, observer=None):
+        encode = getattr(space, "encode", None)
+        meta = {"version": VERSION, "expanded": expanded, "actions": arena.actions, "encoded": encode is not None}
+        sections = []
+
+        if isinstance(container, IndexedPriorityQueue):
+            meta["container"] = "heap"
+            meta["counter"] = container.counter
+            meta["saved_pushes"] = container.saved_pushes
+            entries = container.entries()
+            keys = [key for key, node in entries]
+            nodes = [node for key, node in entries]
+            sections.append((b"KPRI", _float_array([key[0] for key in keys])))
+            sections.append((b"KSEC", _float_array([key[1] for key in keys])))
+            sections.append((b"KCNT", array("q", [key[2] for key in keys]).tobytes()))
+        elif isinstance(container, (Queue, LifoQueue)):
+            meta["container"] = "lifo" if isinstance(container, LifoQueue) else "fifo"
+            nodes = list(container.queue)
+        else:
+            raise TypeError(f"cannot checkpoint a {type(container).__name__} frontier")
+
+        if encode is not None:
+            sections.append((b"FSTA", _pack_ints([encode(node[0]) for node in nodes])))
+        else:
+            sections.append((b"FSTA", pickle.dumps([node[0] for node in nodes], pickle.HIGHEST_PROTOCOL)))
+        sections.append((b"FCST", _float_array([node[1] for node in nodes])))
+        sections.append((b"FHEU", _float_array([node[2] for node in nodes])))
+        sections.append((b"FNOD", array("q", [node[3] for node in nodes]).tobytes()))
+
+        if isinstance(visited, BitSet):
+            meta["closed"] = "bits"
+            meta["closed_count"] = visited.count
+            sections.append((b"CLSD", bytes(visited.bits)))
+        elif encode is not None:
+            meta["closed"] = "ints"
+            sections.append((b"CLSD", _pack_ints(sorted(visited))))
+        else:
+            meta["closed"] = "pickle"
+            sections.append((b"CLSD", pickle.dumps(visited, pickle.HIGHEST_PROTOCOL)))
+
+        sections.append((b"APAR", arena.parents.tobytes()))
+        sections.append((b"AACT", arena.action_ids.tobytes()))
+        sections.append((b"ACST", arena.costs.tobytes()))
+
+        statistics = _statistics(observer)
+        if statistics is not None:
+            meta["statistics"] = {field: getattr(statistics, field) for field in _STATISTICS_FIELDS}
+            meta["statistics"]["elapsed"] = time.perf_counter() - statistics.started
+
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(MAGIC)
+            for tag, payload in [(b"META", pickle.dumps(meta, pickle.HIGHEST_PROTOCOL))] + sections:
+                f.write(_SECTION_HEADER.pack(tag, len(payload)))
+                f.write(payload)
+        os.replace(temporary, self.path)
+        self.saves += 1
+        self._last_nodes = expanded
+        self._last_time = time.monotonic()
+
+    def load(self):
+        """Returns the snapshot at path as a dict of sections, or None if there is nothing to resume."""
+        if not self.resume or not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a search checkpoint")
+        sections = {}
+        offset = len(MAGIC)
+        while offset < len(data):
+            tag, length = _SECTION_HEADER.unpack_from(data, offset)
+            offset += _SECTION_HEADER.size
+            sections[tag.decode()] = data[offset : offset + length]
+            offset += length
+        sections["META"] = pickle.loads(sections["META"])
+        if sections["META"]["version"] != VERSION:
+            raise ValueError(f"{self.path} has checkpoint format {sections['META']['version']}, not {VERSION}")
+        return sections
+
+    def restore(self, snapshot, space, container, visited, arena, observer=None):
+        """Loads a snapshot into freshly created search structures and returns the expansion count."""
+        meta = snapshot["META"]
+        if meta["encoded"]:
+            states = [space.decode(code) for code in _unpack_ints(snapshot["FSTA"])]
+        else:
+            states = pickle.loads(snapshot["FSTA"])
+        node_ids = array("q")
+        node_ids.frombytes(snapshot["FNOD"])
+        nodes = list(zip(states, _floats(snapshot["FCST"]), _floats(snapshot["FHEU"]), node_ids))
+
+        if meta["container"] == "heap":
+            counters = array("q")
+            counters.frombytes(snapshot["KCNT"])
+            keys = zip(_floats(snapshot["KPRI"]), _floats(snapshot["KSEC"]), counters)
+            container.restore(list(zip(keys, nodes)), meta["counter"], meta["saved_pushes"])
+        else:
+            for node in nodes:
+                container.put(node)
+
+        if meta["closed"] == "bits":
+            visited.bits[:] = snapshot["CLSD"]
+            visited.count = meta["closed_count"]
+        elif meta["closed"] == "ints":
+            visited.update(_unpack_ints(snapshot["CLSD"]))
+        else:
+            visited.update(pickle.loads(snapshot["CLSD"]))
+
+        arena.parents.frombytes(snapshot["APAR"])
+        arena.action_ids.frombytes(snapshot["AACT"])
+        arena.costs.frombytes(snapshot["ACST"])
+        arena.actions.extend(meta["actions"])
+        arena.action_index.update((action, i) for i, action in enumerate(arena.actions))
+
+        statistics = _statistics(observer)
+        if statistics is not None and "statistics" in meta:
+            saved = meta["statistics"]
+            for field in _STATISTICS_FIELDS:
+                setattr(statistics, field, saved[field])
+            statistics.started -= saved["elapsed"]
+        self._last_nodes = meta["expanded"]
+        return meta["expanded"]
+
+    def finish(self):
+        """Called when the search ends; removes the snapshot unless keep is set."""
+        if not self.keep and os.path.exists(self.path):
+            os.remove(self.path)
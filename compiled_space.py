@@ -0,0 +1,259 @@
+"""Static search spaces compiled into compressed sparse row (CSR) arrays.
+
+Spaces whose graph never changes (PositionSearchProblem on a layout, the
+GraphSearch test graphs) are re-explored through Python get_successors
+calls on every query. compile_space enumerates the states reachable from
+the start once:
+
+    compiled = compile_space(PositionSearchProblem(game_state))
+    actions = compiled.bfs()                       # to the space's goal
+    actions = compiled.a_star(compiled.heuristic_table(manhattanHeuristic), source=compiled.index[(5, 5)])
+    distances = compiled.distances(compiled.index[(1, 1)])
+
+States are numbered 0..n-1 in discovery order. The edges out of state i
+are offsets[i]:offsets[i + 1] of the targets, costs and action_ids arrays,
+and actions[action_ids[e]] is the action of edge e. The kernels work on
+these arrays alone (as plain lists of ints, which Python indexes faster
+than NumPy arrays), with no get_successors calls or tuple building.
+
+CompiledSpace is itself a SearchSpace over state numbers (with encode,
+decode and state_count), so the search functions in search.py run on it
+too.
+"""
+import heapq
+from collections import deque
+
+import numpy as np
+
+from search import SearchSpace
+
+UNREACHED = -1
+
+
+class CompiledSpace(SearchSpace):
+    """CSR arrays of a compiled space; see compile_space."""
+
+    def __init__(self, space, states, offsets, targets, costs, action_ids, actions, goals, start=0):
+        self.space = space  # the space that was compiled
+        self.states = states  # state number -> original state
+        self.index = {state: i for i, state in enumerate(states)}  # original state -> state number
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self.action_ids = action_ids
+        self.actions = actions
+        self.goals = goals  # bool array: is_final_state of each state
+        self.start = start
+        self.sources = np.repeat(np.arange(len(states), dtype=targets.dtype), np.diff(offsets))  # edge -> its state
+        self.unit_cost = bool(len(costs) == 0 or np.all(costs == 1))
+        self._lists = None
+        self._goal_list = None
+
+    def __len__(self):
+        return len(self.states)
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    # SearchSpace over state numbers
+
+    def get_start_state(self):
+        return self.start
+
+    def is_final_state(self, state):
+        return bool(self.goals[state])
+
+    def get_successors(self, state):
+        (offsets, targets, costs, action_ids) = self._as_lists()
+        actions = self.actions
+        return [(targets[e], actions[action_ids[e]], costs[e]) for e in range(offsets[state], offsets[state + 1])]
+
+    def encode(self, state):
+        return state
+
+    def decode(self, code):
+        return code
+
+    def state_count(self):
+        return len(self.states)
+
+    # Kernels
+
+    def _as_lists(self):
+        # Indexing Python lists is several times faster than indexing NumPy arrays one element at a time.
+        if self._lists is None:
+            self._lists = (
+                self.offsets.tolist(),
+                self.targets.tolist(),
+                [int(cost) if cost.is_integer() else cost for cost in self.costs.tolist()],
+                self.action_ids.tolist(),
+            )
+        return self._lists
+
+    def _path(self, parent_edges, state):
+        """Actions along the parent edges from the source to state."""
+        path = []
+        action_ids, sources = self.action_ids, self.sources
+        while parent_edges[state] != UNREACHED:
+            edge = parent_edges[state]
+            path.append(self.actions[action_ids[edge]])
+            state = sources[edge]
+        path.reverse()
+        return path
+
+    def _breadth_first(self, source, is_goal=None):
+        """Breadth-first search over the arrays from source.
+
+        Returns (depths, parent edges, goal reached or None) as lists, with
+        UNREACHED for states not reached; stops at the first goal popped when
+        is_goal is given.
+        """
+        (offsets, targets, costs, action_ids) = self._as_lists()
+        depths = [UNREACHED] * len(self.states)
+        parent_edges = [UNREACHED] * len(self.states)
+        depths[source] = 0
+        queue = deque([source])
+        while queue:
+            state = queue.popleft()
+            if is_goal is not None and is_goal(state):
+                return depths, parent_edges, state
+            depth = depths[state] + 1
+            for e in range(offsets[state], offsets[state + 1]):
+                target = targets[e]
+                if depths[target] == UNREACHED:
+                    depths[target] = depth
+                    parent_edges[target] = e
+                    queue.append(target)
+        return depths, parent_edges, None
+
+    def _is_goal(self, goals):
+        if goals is not None:
+            return set(goals).__contains__
+        if self._goal_list is None:
+            self._goal_list = self.goals.tolist()
+        return self._goal_list.__getitem__
+
+    def bfs(self, source=None, goals=None):
+        """Fewest-steps plan from source (default: the start) to a goal, or None.
+
+        goals is an iterable of state numbers; by default the space's own
+        final states.
+        """
+        source = self.start if source is None else source
+        (depths, parent_edges, goal) = self._breadth_first(source, self._is_goal(goals))
+        return None if goal is None else self._path(parent_edges, goal)
+
+    def dijkstra(self, source=None, goals=None):
+        """Cheapest plan from source to a goal, or None."""
+        return self.a_star(None, source, goals)
+
+    def a_star(self, heuristic=None, source=None, goals=None):
+        """A* from source to a goal over the arrays, or None if no goal is reachable.
+
+        heuristic is a sequence of h values indexed by state number (see
+        heuristic_table), or None for Dijkstra.
+        """
+        source = self.start if source is None else source
+        is_goal = self._is_goal(goals)
+        (offsets, targets, costs, action_ids) = self._as_lists()
+        h = None if heuristic is None else (heuristic.tolist() if isinstance(heuristic, np.ndarray) else heuristic)
+        best = {source: 0}
+        parents = {source: UNREACHED}
+        closed = set()
+        counter = 0
+        frontier = [(0 if h is None else h[source], 0, counter, source)]
+        while frontier:
+            (_, g, _, state) = heapq.heappop(frontier)
+            if state in closed:
+                continue
+            if is_goal(state):
+                return self._path(parents, state)
+            closed.add(state)
+            for e in range(offsets[state], offsets[state + 1]):
+                target = targets[e]
+                next_g = g + costs[e]
+                if target not in closed and next_g < best.get(target, float("inf")):
+                    best[target] = next_g
+                    parents[target] = e
+                    counter += 1
+                    heapq.heappush(frontier, (next_g if h is None else next_g + h[target], next_g, counter, target))
+        return None
+
+    def distances(self, source=None):
+        """Cost of the cheapest path from source to every state, as an array (inf where unreachable)."""
+        source = self.start if source is None else source
+        if self.unit_cost:
+            depths = np.array(self._breadth_first(source)[0], dtype=np.float64)
+            depths[depths == UNREACHED] = np.inf
+            return depths
+        (offsets, targets, costs, action_ids) = self._as_lists()
+        distances = np.full(len(self.states), np.inf)
+        settled = [False] * len(self.states)
+        frontier = [(0, source)]
+        while frontier:
+            (distance, state) = heapq.heappop(frontier)
+            if settled[state]:
+                continue
+            settled[state] = True
+            distances[state] = distance
+            for e in range(offsets[state], offsets[state + 1]):
+                if not settled[targets[e]]:
+                    heapq.heappush(frontier, (distance + costs[e], targets[e]))
+        return distances
+
+    def heuristic_table(self, heuristic, problem=None):
+        """heuristic(state, problem) of every compiled state, for a_star.
+
+        problem defaults to the original space passed to compile_space.
+        """
+        if problem is None:
+            problem = self.space
+        return np.array([heuristic(state, problem) for state in self.states], dtype=np.float64)
+
+
+def compile_space(space, max_states=None):
+    """Enumerates the states reachable from the start of space into a CompiledSpace.
+
+    Every reachable state is expanded once with get_successors and tested
+    once with is_final_state. max_states guards against spaces too large to
+    enumerate (ValueError is raised beyond it).
+    """
+    start = space.get_start_state()
+    states = [start]
+    index = {start: 0}
+    offsets = [0]
+    targets, costs, action_ids = [], [], []
+    actions, action_index = [], {}
+    goals = []
+    i = 0
+    while i < len(states):
+        state = states[i]
+        goals.append(bool(space.is_final_state(state)))
+        for next_state, action, cost in space.get_successors(state):
+            target = index.get(next_state)
+            if target is None:
+                target = index[next_state] = len(states)
+                states.append(next_state)
+                if max_states is not None and len(states) > max_states:
+                    raise ValueError(f"space has more than {max_states} reachable states")
+            action_id = action_index.get(action)
+            if action_id is None:
+                action_id = action_index[action] = len(actions)
+                actions.append(action)
+            targets.append(target)
+            costs.append(cost)
+            action_ids.append(action_id)
+        offsets.append(len(targets))
+        i += 1
+    index_type = np.int32 if len(states) < 2**31 else np.int64
+    return CompiledSpace(
+        space,
+        states,
+        np.array(offsets, dtype=np.int64),
+        np.array(targets, dtype=index_type),
+        np.array(costs, dtype=np.float64),
+        np.array(action_ids, dtype=np.int16 if len(actions) < 2**15 else np.int32),
+        actions,
+        np.array(goals, dtype=bool),
+    )
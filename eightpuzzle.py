@@ -1,64 +1,268 @@
 from heuristics import eight_puzzle_heuristic
-from search import SearchSpace, breadth_first_search, depth_first_search, a_star_search
-import sys
+from search import OPPOSITE_ACTIONS, SearchSpace, breadth_first_search, depth_first_search, a_star_search, ida_star_search, undo_pruning, run_with_statistics
+from tileboards import BLANK_MOVES as ROW_COLUMN_MOVES, blank_finder, field_masks, move_table, pack as pack_board, run_main, unpack as unpack_board
+import mmap
+import os
+import profiling
+import numpy as np
 from torch import tensor
-import torch
+
+
+# A board is packed into a 36-bit int, four bits per square in row-major order
+# (see tileboards): the tile on square i (0 for the blank) is (state >> 4 * i) & 15.
+NIBBLE_ONES, NIBBLE_HIGHS = field_masks(3)
+
+
+def pack(board):
+    """The packed int of a board given as a 3x3 tensor/array/list, a flat sequence of 9 tiles, or a packed int."""
+    return pack_board(board, 4)
+
+
+def unpack(state):
+    """The 9 tiles of a packed board, in row-major order."""
+    return unpack_board(state, 4, 9)
+
+
+def to_tensor(state):
+    """A packed board as the 3x3 tensor the puzzles used to be given as."""
+    return tensor(unpack(state)).reshape(3, 3)
+
+
+# Index of the blank: the one zero nibble, found without a loop
+blank_square = blank_finder(3)
+
+GOAL = pack([1, 2, 3, 4, 5, 6, 7, 8, 0])
+
+# Blank moves in the order get_successors has always produced them: (action, offset of the square swapped with the blank)
+BLANK_MOVES = tuple((action, 3 * dr + dc) for action, dr, dc in ROW_COLUMN_MOVES)
+
+
+def _legal(square, offset):
+    if offset in (3, -3):
+        return 0 <= square + offset < 9
+    return (square % 3) + offset in (0, 1, 2)
+
+
+# For each blank square: (action, shift of the square the blank moves to, multiplier that moves its tile into the blank)
+# so the successor is state + tile * multiplier with tile = (state >> shift) & 15.
+MOVE_TABLE = move_table(3)
 
 
 class EightPuzzleSearchSpace(SearchSpace):
+    """The eight puzzle over packed int boards (see pack).
+
+    States are ints, so they hash by value and the closed set recognizes
+    repeated boards; successors come from MOVE_TABLE with a few integer
+    operations each. The initial board may still be given as a tensor.
+    """
 
     def __init__(self, initial_board):
-        self.board = initial_board
+        self.board = pack(initial_board)
 
     def get_start_state(self):
         return self.board
 
     def is_final_state(self, state):
-        return torch.equal(tensor([[1, 2, 3], [4, 5, 6], [7, 8, 0]]), state)
-
-    """"Helper function: creates a new state by swapping the zero either vertically or horizontally."""
-    def make_new_state(self, state, swap, direction, zeroLocation):
-        newState = state.clone()
-        if direction == 'vertical':
-            newState[swap[1]][zeroLocation[1]] = state[swap[0]][zeroLocation[1]].item()
-            newState[swap[0]][zeroLocation[1]] = state[swap[1]][zeroLocation[1]].item()
-
-        if direction == 'horizontal':
-            newState[zeroLocation[0]][swap[1]] = state[zeroLocation[0]][swap[0]].item()
-            newState[zeroLocation[0]][swap[0]] = state[zeroLocation[0]][swap[1]].item()
-            
-        return newState
-    
+        return state == GOAL
+
+    def encode(self, state):
+        return state
+
+    def decode(self, code):
+        return code
+
+    def state_count(self):
+        return 1 << 36  # packed boards are 36-bit ints
+
     def get_successors(self, state):
-        successors = []
-
-        # Locate the zero in the current state.
-        for i in range(3):
-            for j in range(3):
-                if state[i][j].item() == 0:
-                    row_zero = i
-                    col_zero = j
-        zeroLocation = (row_zero, col_zero)
-        
-        # Vertical swaps: up and/or down, depending on the row of the zero.
-        if row_zero == 0:            
-            successors.append((self.make_new_state(state,(0,1),'vertical',zeroLocation),"South",1))
-        elif row_zero == 1:
-            successors.append((self.make_new_state(state,(1,2),'vertical',zeroLocation),"South",1))
-            successors.append((self.make_new_state(state,(1,0),'vertical',zeroLocation),"North",1))
-        elif row_zero == 2:
-            successors.append((self.make_new_state(state,(2,1),'vertical',zeroLocation),"North",1))
-
-        # Horizontal swaps: left and/or right, depending on the column of the zero.
-        if col_zero == 0:
-            successors.append((self.make_new_state(state,(0,1),'horizontal',zeroLocation),"East",1))
-        elif col_zero == 1:
-            successors.append((self.make_new_state(state,(1,2),'horizontal',zeroLocation), "East", 1))
-            successors.append((self.make_new_state(state,(1,0),'horizontal',zeroLocation), "West", 1))
-        elif col_zero == 2:
-            successors.append((self.make_new_state(state,(2,1),'horizontal',zeroLocation), "West", 1))
-        
-        return successors
+        return [
+            (state + ((state >> shift) & 15) * multiplier, action, 1)
+            for action, shift, multiplier in MOVE_TABLE[blank_square(state)]
+        ]
+
+    def get_predecessors(self, state):
+        """Every move is reversible: each neighbouring board reaches state by the opposite blank move."""
+        return [(board, OPPOSITE_ACTIONS[action], cost) for board, action, cost in self.get_successors(state)]
+
+    def get_goal_states(self):
+        return [GOAL]
+
+    def get_successors_batch(self, states):
+        """Vectorized get_successors: every legal blank move of every board is made with NumPy integer arithmetic."""
+        batch = [[] for _ in states]
+        for action, movers, new_boards in _blank_moves(np.array(states, dtype=np.int64)):
+            for i, new_board in zip(movers.tolist(), new_boards.tolist()):
+                batch[i].append((new_board, action, 1))
+        return batch
+
+
+# For each blank move offset, whether it is legal with the blank on each square
+LEGAL_BLANKS = {offset: np.array([_legal(square, offset) for square in range(9)]) for action, offset in BLANK_MOVES}
+
+
+def _blank_squares(boards):
+    """blank_square of each board in an int64 array."""
+    flags = (boards - NIBBLE_ONES) & ~boards & NIBBLE_HIGHS
+    return (np.frexp((flags & -flags).astype(np.float64))[1] - 1) >> 2
+
+
+def _blank_moves(boards):
+    """(action, indices of the boards where the move is legal, the boards it makes) for each blank move."""
+    blanks = _blank_squares(boards)
+    moves = []
+    for action, offset in BLANK_MOVES:
+        movers = np.flatnonzero(LEGAL_BLANKS[offset][blanks])
+        blank_shifts = 4 * blanks[movers]
+        target_shifts = blank_shifts + 4 * offset
+        tiles = (boards[movers] >> target_shifts) & 15
+        moves.append((action, movers, boards[movers] + (tiles << blank_shifts) - (tiles << target_shifts)))
+    return moves
+
+
+# Perfect distance table
+#
+# A board is solvable iff its eight tiles, read in row-major order, form an
+# even permutation. Lehmer ranks 2k and 2k + 1 differ by swapping the last
+# two tiles, so exactly one of them is even and rank >> 1 numbers the
+# solvable orders of the tiles 0..20159 for each of the 9 blank squares.
+
+TABLE_SIZE = 9 * 20160  # solvable boards, one byte each
+UNSOLVABLE = 255
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".eightpuzzle_distances")
+
+# (7 - i)! weights of the Lehmer digits of eight tiles
+_LEHMER_WEIGHTS = np.array([5040, 720, 120, 24, 6, 2, 1, 1], dtype=np.int64)
+
+
+def board_index(state):
+    """Index of a packed board in the distance table, or None if the board is unsolvable."""
+    tiles = []
+    blank = 0
+    for square in range(9):
+        tile = (state >> (4 * square)) & 15
+        if tile:
+            tiles.append(tile)
+        else:
+            blank = square
+    rank = 0
+    inversions = 0
+    for i in range(7):
+        tile = tiles[i]
+        smaller = 0
+        for later in tiles[i + 1:]:
+            if later < tile:
+                smaller += 1
+        rank = rank * (8 - i) + smaller
+        inversions += smaller
+    if inversions & 1:
+        return None
+    return blank * 20160 + (rank >> 1)
+
+
+def board_indexes(boards):
+    """board_index of each solvable board in an int64 array."""
+    squares = (boards[:, None] >> (4 * np.arange(9))) & 15
+    tiles = squares[squares != 0].reshape(len(boards), 8)
+    digits = (tiles[:, None, :] < tiles[:, :, None]) & np.triu(np.ones((8, 8), dtype=bool), 1)
+    ranks = digits.sum(axis=2) @ _LEHMER_WEIGHTS
+    return _blank_squares(boards) * 20160 + (ranks >> 1)
+
+
+def build_distance_table():
+    """Distance to the goal of every solvable board, by breadth-first search backwards from the goal.
+
+    Every move is reversible, so the successors of a layer are its
+    predecessors. Returns a TABLE_SIZE-byte bytearray indexed by board_index.
+    """
+    distances = np.full(TABLE_SIZE, UNSOLVABLE, dtype=np.uint8)
+    layer = np.array([GOAL], dtype=np.int64)
+    distances[board_indexes(layer)] = 0
+    depth = 0
+    while len(layer):
+        depth += 1
+        boards = np.concatenate([new_boards for action, movers, new_boards in _blank_moves(layer)])
+        indexes = board_indexes(boards)
+        unseen = distances[indexes] == UNSOLVABLE
+        (indexes, first) = np.unique(indexes[unseen], return_index=True)
+        layer = boards[unseen][first]
+        distances[indexes] = depth
+    return bytearray(distances.tobytes())
+
+
+class DistanceTable:
+    """The exact number of moves from every solvable board to the goal, memory-mapped from a file.
+
+    The file (TABLE_SIZE bytes) is built with build_distance_table the
+    first time it is missing. A table is a perfect heuristic for
+    a_star_search, so A* expands only the boards along one optimal path,
+    and solve() walks that path directly:
+
+        table = DistanceTable()
+        actions = a_star_search(space, table.heuristic)
+        actions = table.solve(space.get_start_state())
+
+    Parameters
+    ----------
+    path : str
+        File the table is read from (and written to if it does not exist)
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) != TABLE_SIZE:
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(build_distance_table())
+            os.replace(temporary, path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def distance(self, state):
+        """Fewest moves from the board to the goal, or None if it cannot reach it."""
+        index = board_index(pack(state))
+        return None if index is None else self.map[index]
+
+    def heuristic(self, state, search_space=None):
+        """distance() as a heuristic (state, search_space) function; unsolvable boards get infinity."""
+        distance = self.distance(state)
+        return float("inf") if distance is None else distance
+
+    def solve(self, state):
+        """An optimal list of actions from the board to the goal, following successors one move closer each step."""
+        state = pack(state)
+        distance = self.distance(state)
+        if distance is None:
+            return None
+        actions = []
+        while distance:
+            for action, shift, multiplier in MOVE_TABLE[blank_square(state)]:
+                next_state = state + ((state >> shift) & 15) * multiplier
+                if self.map[board_index(next_state)] == distance - 1:
+                    break
+            actions.append(action)
+            state = next_state
+            distance -= 1
+        return actions
+
+    def close(self):
+        self.map.close()
+
+
+_distance_table = None
+
+
+def distance_table():
+    """The DistanceTable at DEFAULT_TABLE_PATH, opened once per process."""
+    global _distance_table
+    if _distance_table is None:
+        _distance_table = DistanceTable()
+    return _distance_table
+
+
+def perfect_heuristic(state, search_space):
+    """Exact distance to the goal, from the shared distance_table()."""
+    return distance_table().heuristic(state)
+
 
 example_eight_puzzles = [
     tensor([[1, 2, 3], [4, 5, 6], [7, 8, 0]]),
@@ -99,22 +303,48 @@ example_eight_puzzles = [
 # eventually just crashes when the computer runs out of memory. 
 
 
-if __name__ == "__main__":
+def main(argv):
     try:
-        solution_depth = int(sys.argv[1])
+        solution_depth = int(argv[0])
         assert 0 <= solution_depth < len(example_eight_puzzles)
     except Exception:
         print(
-            f"Usage: python eightpuzzle.py SOLUTION_DEPTH\n  where 0 <= SOLUTION_DEPTH <= {len(example_eight_puzzles)-1}"
+            f"Usage: python eightpuzzle.py SOLUTION_DEPTH [astar|ida|table] [--profile PREFIX]\n  where 0 <= SOLUTION_DEPTH <= {len(example_eight_puzzles)-1}"
         )
         exit()
 
     space = EightPuzzleSearchSpace(example_eight_puzzles[solution_depth])
     print("\nRunning breadth first search:")
-    result = breadth_first_search(space)
-    print(result)
+    with profiling.phase("search"):
+        result = run_with_statistics(breadth_first_search, space)
+    print(f"Search nodes visited: {result.statistics.expanded}")
+    print(result.actions)
 
-    if len(sys.argv) > 2 and sys.argv[2] == "astar":
+    if len(argv) > 1 and argv[1] == "astar":
         print("\nRunning A* search with your current heuristic:")
-        result = a_star_search(space, eight_puzzle_heuristic)
-        print(result)
+        with profiling.phase("search"):
+            result = run_with_statistics(a_star_search, space, eight_puzzle_heuristic)
+        print(f"Search nodes visited: {result.statistics.expanded}")
+        print(result.actions)
+
+    if len(argv) > 1 and argv[1] == "ida":
+        print("\nRunning IDA* search with your current heuristic:")
+        with profiling.phase("search"):
+            result = run_with_statistics(ida_star_search, space, eight_puzzle_heuristic, prune=undo_pruning)
+        for threshold, nodes in result.statistics.iterations:
+            print(f"  threshold {threshold}: {nodes} nodes")
+        print(f"Search nodes visited: {result.statistics.expanded}")
+        print(result.actions)
+
+    if len(argv) > 1 and argv[1] == "table":
+        print("\nWalking the perfect distance table:")
+        with profiling.phase("distance table"):
+            table = distance_table()
+        with profiling.phase("search"):
+            actions = table.solve(space.get_start_state())
+        print(f"Distance to the goal: {len(actions)}")
+        print(actions)
+
+
+if __name__ == "__main__":
+    run_main(main, "eightpuzzle")
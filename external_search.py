@@ -0,0 +1,212 @@
+"""External-memory breadth-first search with delayed duplicate detection.
+
+Used by breadth_first_search(space, external=True, ...) for spaces whose
+closed set does not fit in RAM. Nothing but the successor buffer of the
+layer being generated is held in memory:
+
+  - Each BFS layer lives in a file of fixed-width records
+    (state code, parent code, action id), sorted by state code.
+  - Successors of a layer are buffered up to the RAM budget, sorted and
+    written out as run files.
+  - The runs are merged, duplicates within the layer are dropped, and so are
+    states already in the sorted file of all previously visited states
+    (delayed duplicate detection); the visited file is then merged with the
+    new layer.
+  - Files are read through memory maps, and the solution is traced back by
+    binary search of each layer file for the parent of the state found.
+
+The space must provide encode/decode and state_count (see search.SearchSpace),
+so that every state fits in a fixed number of bytes.
+"""
+import heapq
+import mmap
+import os
+import shutil
+import tempfile
+
+# Rough number of bytes a buffered successor tuple takes in Python, used to turn
+# the RAM budget into a run length.
+BYTES_PER_BUFFERED_RECORD = 160
+
+NO_ACTION = 255
+
+
+class _RecordFile:
+    """A read-only memory map over a file of fixed-width records."""
+
+    def __init__(self, path, record_size):
+        self.path = path
+        self.record_size = record_size
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // record_size
+
+    def __iter__(self):
+        data, size = self.map, self.record_size
+        for offset in range(0, self.count * size, size):
+            yield data[offset : offset + size]
+
+    def find(self, key):
+        """Binary search for the record whose leading bytes equal key."""
+        data, size, width = self.map, self.record_size, len(key)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            probe = data[middle * size : middle * size + width]
+            if probe < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and data[low * size : low * size + width] == key:
+            return data[low * size : (low + 1) * size]
+        return None
+
+    def close(self):
+        if self.map:
+            self.map.close()
+        self.file.close()
+
+
+def _write_sorted_run(path, records):
+    records.sort()
+    with open(path, "wb") as f:
+        f.write(b"".join(records))
+
+
+def external_breadth_first_search(space, ram_budget=256 * 1024 * 1024, tmpdir=None, keep_files=False, observer=None):
+    """Breadth-first search that keeps its layers and closed set on disk.
+
+    Parameters
+    ----------
+    space : SearchSpace
+        A space with encode, decode and state_count
+    ram_budget : int
+        Approximate bytes of successor records buffered before a sorted run is
+        written to disk
+    tmpdir : str or None
+        Directory in which the layer and run files are created (a fresh
+        subdirectory is made and removed afterwards unless keep_files is set)
+    """
+    encode = getattr(space, "encode", None)
+    state_count = getattr(space, "state_count", None)
+    if encode is None or state_count is None:
+        raise ValueError("external breadth-first search needs a space with encode, decode and state_count")
+    decode = space.decode
+    width = max(1, ((state_count() - 1).bit_length() + 7) // 8)
+    record_size = 2 * width + 1
+    run_length = max(1024, ram_budget // BYTES_PER_BUFFERED_RECORD)
+    actions, action_ids = [], {}
+
+    def action_id(action):
+        found = action_ids.get(action)
+        if found is None:
+            if len(actions) == NO_ACTION:
+                raise ValueError("external breadth-first search supports at most 255 distinct actions")
+            found = action_ids[action] = len(actions)
+            actions.append(action)
+        return found
+
+    directory = tempfile.mkdtemp(prefix="external-bfs-", dir=tmpdir)
+    layers = []
+    if observer is not None:
+        observer.on_start(space)
+
+    def trace(layer_index, code_bytes):
+        """Actions from the start to the state stored in layer layer_index."""
+        path = []
+        while layer_index > 0:
+            record = layers[layer_index].find(code_bytes)
+            path.append(actions[record[-1]])
+            code_bytes = record[width : 2 * width]
+            layer_index -= 1
+        path.reverse()
+        return tuple(path)
+
+    try:
+        start = space.get_start_state()
+        start_bytes = encode(start).to_bytes(width, "big")
+        if observer is not None:
+            observer.on_expand(start, 0, 1)
+        if space.is_final_state(start):
+            if observer is not None:
+                observer.on_finish((), 0)
+            return ()
+        layer_path = os.path.join(directory, "layer-0")
+        with open(layer_path, "wb") as f:
+            f.write(start_bytes + start_bytes + bytes([NO_ACTION]))
+        layers.append(_RecordFile(layer_path, record_size))
+        visited_path = os.path.join(directory, "visited-0")
+        with open(visited_path, "wb") as f:
+            f.write(start_bytes)
+
+        depth = 0
+        while layers[depth].count:
+            # Expand the current layer into sorted runs of successor records.
+            runs, buffer = [], []
+            for record in layers[depth]:
+                parent_bytes = record[:width]
+                state = decode(int.from_bytes(parent_bytes, "big"))
+                if depth and observer is not None:
+                    observer.on_expand(state, depth, layers[depth].count)
+                successors = space.get_successors(state)
+                for next_state, action, cost in successors:
+                    if space.is_final_state(next_state):
+                        solution = trace(depth, parent_bytes) + (action,)
+                        if observer is not None:
+                            observer.on_finish(solution, depth + 1)
+                        return solution
+                    buffer.append(encode(next_state).to_bytes(width, "big") + parent_bytes + bytes([action_id(action)]))
+                if observer is not None:
+                    observer.on_generate(len(successors))
+                if len(buffer) >= run_length:
+                    runs.append(os.path.join(directory, f"run-{depth + 1}-{len(runs)}"))
+                    _write_sorted_run(runs[-1], buffer)
+                    buffer = []
+            if buffer:
+                runs.append(os.path.join(directory, f"run-{depth + 1}-{len(runs)}"))
+                _write_sorted_run(runs[-1], buffer)
+            buffer = []
+
+            # Merge the runs, dropping duplicates and previously visited states.
+            run_files = [_RecordFile(path, record_size) for path in runs]
+            visited = _RecordFile(visited_path, width)
+            visited_records = iter(visited)
+            next_visited = next(visited_records, None)
+            layer_path = os.path.join(directory, f"layer-{depth + 1}")
+            next_visited_path = os.path.join(directory, f"visited-{depth + 1}")
+            previous_key = None
+            with open(layer_path, "wb") as layer_file, open(next_visited_path, "wb") as visited_file:
+                for record in heapq.merge(*run_files):
+                    key = record[:width]
+                    if key == previous_key:
+                        continue
+                    previous_key = key
+                    while next_visited is not None and next_visited < key:
+                        visited_file.write(next_visited)
+                        next_visited = next(visited_records, None)
+                    if next_visited == key:
+                        continue
+                    layer_file.write(record)
+                    visited_file.write(key)
+                while next_visited is not None:
+                    visited_file.write(next_visited)
+                    next_visited = next(visited_records, None)
+            visited.close()
+            for run_file in run_files:
+                run_file.close()
+                os.remove(run_file.path)
+            os.remove(visited_path)
+            visited_path = next_visited_path
+            layers.append(_RecordFile(layer_path, record_size))
+            depth += 1
+            if observer is not None:
+                observer.on_iteration(depth, layers[depth].count)
+        if observer is not None:
+            observer.on_finish(None, None)
+        return None
+    finally:
+        for layer in layers:
+            layer.close()
+        if not keep_files:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -1,7 +1,8 @@
-from search import SearchSpace
+from search import SearchSpace, distance_map
+import profiling
+import numpy as np
 import torch
 from torch import tensor 
-from collections import deque
 
 
 """ We're describing each maze with a Python dictionary, tracking the maze's:
@@ -23,6 +24,23 @@ In the eight puzzle project the search space's only attribute was the initial bo
 the maze, the height, width, and walls will remain constant. We don't need to clutter up the state
 by including them, so can store them within the search space object itself as the maze attribute.
 """
+class PacmanMazeSearchSpace(SearchSpace):
+    """Pacman's position alone in the maze of a PacmanFoodSearchSpace, for computing maze distances."""
+
+    def __init__(self, food_space):
+        self.food_space = food_space
+
+    def get_start_state(self):
+        return self.food_space.pac_food_state[0]
+
+    def is_final_state(self, state):
+        return False
+
+    def get_successors(self, state):
+        return [(next_state[0], direction, cost)
+                for next_state, direction, cost in self.food_space.get_successors((state, frozenset()))]
+
+
 class PacmanFoodSearchSpace(SearchSpace):
     def __init__(self, dict_maze):
         """A Tensorless attempt to define the FoodSearchProblem search space. I only just realized that Sets are O(1) searches. Ah. Shit."""
@@ -36,9 +54,26 @@ class PacmanFoodSearchSpace(SearchSpace):
         # - pacman position as a tuple
         # - a frozenset of food positions
 
-        self.distance_cache = {} # for getdistance
+        # Open cells as a boolean grid padded by one cell on each side, so that
+        # get_successors_batch can test all four moves of many states at once.
+        self.open_grid = np.ones((self.width + 2, self.height + 2), dtype=bool)
+        self.open_grid[[0, -1], :] = False
+        self.open_grid[:, [0, -1]] = False
+        if self.walls:
+            wall_xs, wall_ys = zip(*self.walls)
+            self.open_grid[np.array(wall_xs) + 1, np.array(wall_ys) + 1] = False
+
+        # Compact state encoding: code = food bitmask * (number of open cells) + rank of pacman's cell
+        self.cells = [(x, y) for x in range(self.width) for y in range(self.height) if (x, y) not in self.walls]
+        self.cell_rank = {cell: rank for rank, cell in enumerate(self.cells)}
+        self.food_order = sorted(self.food)
+        self.food_bit = {food: 1 << i for i, food in enumerate(self.food_order)}
+
+        self.maze_space = PacmanMazeSearchSpace(self)
+        self.distance_maps = {} # for get_distance: source position -> distances to every cell
         self.dist = {}
-        self.precompute_distances()
+        with profiling.phase("distance precompute"):
+            self.precompute_distances()
         """A previous attempt to do this with tensors --- saved for reference."""
         # self.maze = torch.zeros((self.width, self.height), dtype=torch.int32)
         # self.maze[tuple(zip(*dict_maze['walls']))] = 1  # set walls to 1
@@ -63,6 +98,21 @@ class PacmanFoodSearchSpace(SearchSpace):
     def get_start_state(self):
         return self.pac_food_state
 
+    def encode(self, state):
+        mask = 0
+        food_bit = self.food_bit
+        for food in state[1]:
+            mask |= food_bit[food]
+        return mask * len(self.cells) + self.cell_rank[state[0]]
+
+    def decode(self, code):
+        mask, rank = divmod(code, len(self.cells))
+        food = frozenset(food for i, food in enumerate(self.food_order) if mask >> i & 1)
+        return (self.cells[rank], food)
+
+    def state_count(self):
+        return len(self.cells) << len(self.food_order)
+
     def is_final_state(self, state):
         if len(state[1]) == 0:      # if food positions list is empty --- no more food left
             return True
@@ -111,46 +161,75 @@ class PacmanFoodSearchSpace(SearchSpace):
             #             successors.append((new_state, directions[i], 1))  # cost is always 1
 
         return successors
+
+    move_names = ("North", "South", "East", "West")
+    move_vectors = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)])
+
+    def get_successors_batch(self, states):
+        """Vectorized get_successors: bounds and wall checks for all states are done in one NumPy lookup."""
+        positions = np.array([state[0] for state in states])
+        candidates = positions[:, None, :] + self.move_vectors[None, :, :]  # (states, moves, xy)
+        is_open = self.open_grid[candidates[..., 0] + 1, candidates[..., 1] + 1]
+        batch = []
+        for state, open_moves, targets in zip(states, is_open.tolist(), candidates.tolist()):
+            food = state[1]
+            successors = []
+            for direction, move_open, target in zip(self.move_names, open_moves, targets):
+                if move_open:
+                    new_pacman = tuple(target)
+                    if new_pacman in food:
+                        successors.append(((new_pacman, food - {new_pacman}), direction, 1))
+                    else:
+                        successors.append(((new_pacman, food), direction, 1))
+            batch.append(successors)
+        return batch
     
     def get_distance(self, pos1, pos2):
         #Function to get distance within maze, accounting for walls.
-        from collections import deque  
-        queue = deque([(pos1, 0)])  # (position, distance)
-        visited = set()
-
-        #add cache to speed up
-        if (pos1, pos2) in self.distance_cache:
-            return self.distance_cache[(pos1, pos2)]
-        if (pos2, pos1) in self.distance_cache:
-            return self.distance_cache[(pos2, pos1)]
-
-        while queue:
-            current_pos, dist = queue.popleft()
-            if current_pos == pos2:
-                self.distance_cache[(pos1, pos2)] = dist
-                return dist
-            if current_pos in visited:
-                continue
-            visited.add(current_pos)
-            temp_state = (current_pos, frozenset())  
-            for (next_state, direction, cost) in self.get_successors(temp_state):
-                if next_state[0] not in visited:   
-                    visited.add(next_state[0])
-                    queue.append((next_state[0], dist + 1))
-
-        return float("inf") # if no path found
+        #One exploration from pos1 gives the distance to every cell; keep the whole map for later queries.
+        if pos1 not in self.distance_maps:
+            if pos2 in self.distance_maps:
+                pos1, pos2 = pos2, pos1
+            else:
+                self.distance_maps[pos1] = distance_map(self.maze_space, pos1)
+        return self.distance_maps[pos1].get(pos2, float("inf")) # inf if no path found
     
+    def greedy_plan(self):
+        """A nearest-dot-first tour: walk a shortest maze path to the closest remaining dot, and repeat.
+
+        Returns (actions, cost), or None if some dot cannot be reached.
+        """
+        position, food = self.pac_food_state
+        food = set(food)
+        food.discard(position)
+        actions = []
+        while food:
+            target = min(food, key=lambda dot: (self.get_distance(position, dot), dot))
+            if self.get_distance(position, target) == float("inf"):
+                return None
+            if target not in self.distance_maps:
+                self.distance_maps[target] = distance_map(self.maze_space, target)
+            to_target = self.distance_maps[target]
+            while position != target:
+                # Any move that gets one step closer to the target stays on a shortest path.
+                for next_position, direction, _ in self.maze_space.get_successors(position):
+                    if to_target.get(next_position) == to_target[position] - 1:
+                        break
+                actions.append(direction)
+                position = next_position
+                food.discard(position)
+        return tuple(actions), len(actions)
+
     def precompute_distances(self):
 
         # Precompute distances between all pairs of food positions and pacman start position
         positions = list(self.food) + [self.pac_food_state[0]]
         for i in range(len(positions)):
-            for j in range(i + 1, len(positions)):
-                pos1 = positions[i]
-                pos2 = positions[j]
-                distance = self.get_distance(pos1, pos2)  
-                self.dist[(pos1, pos2)] = distance
-                self.dist[(pos2, pos1)] = distance
+            distances = distance_map(self.maze_space, positions[i], targets=positions[i + 1:])
+            for pos2 in positions[i + 1:]:
+                distance = distances.get(pos2, float("inf"))
+                self.dist[(positions[i], pos2)] = distance
+                self.dist[(pos2, positions[i])] = distance
     
     
         
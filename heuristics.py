@@ -1,15 +1,110 @@
+import numpy as np
 from torch import tensor
 import torch
 
 
+# The eight puzzle goal as a packed board (see eightpuzzle.pack): tile of square i in bits 4*i..4*i+3
+EIGHT_PUZZLE_GOAL = 0x087654321
+
+
 def eight_puzzle_heuristic(state, search_space):
-    flattened_goal = tensor([1,2,3,4,5,6,7,8])
-    flattened_state = state.flatten()
-    mismatched_tiles = torch.ne(flattened_goal, flattened_state[:-1]) # ignore the blank tile
-    return torch.sum(mismatched_tiles).item()
+    if not isinstance(state, int):  # a tensor board
+        flattened_goal = tensor([1,2,3,4,5,6,7,8])
+        flattened_state = state.flatten()
+        mismatched_tiles = torch.ne(flattened_goal, flattened_state[:-1]) # ignore the blank tile
+        return torch.sum(mismatched_tiles).item()
+    differences = (state ^ EIGHT_PUZZLE_GOAL) & 0xFFFFFFFF # ignore the blank tile's square
+    # one bit per square whose nibble differs
+    return bin((differences | differences >> 1 | differences >> 2 | differences >> 3) & 0x11111111).count("1")
     # With a solution depth of 10, where BFS went through 102835 search nodes, A* went through 53.
     # At depth 13, BFS went through 758195 nodes. A* went through 1010. 
 
+# Per-line lookup tables over 12-bit chunks of packed eight-puzzle boards. Row r is the chunk
+# (state >> 12 * r) & 0xFFF; for column c, spread = (state >> 4 * c) & 0xF00F00F holds its three
+# nibbles 12 bits apart and (spread | spread >> 8 | spread >> 16) & 0xFFF packs them into a chunk.
+
+def _line_conflicts(goal_places):
+    """Tiles to take out of a line so the rest are in goal order: length minus the longest increasing run."""
+    longest = [1] * len(goal_places)
+    for i in range(len(goal_places)):
+        for j in range(i):
+            if goal_places[j] < goal_places[i]:
+                longest[i] = max(longest[i], longest[j] + 1)
+    return len(goal_places) - max(longest, default=0)
+
+
+def _eight_puzzle_line_tables():
+    row_manhattan = np.zeros((3, 4096), dtype=np.int64)
+    row_conflicts = np.zeros((3, 4096), dtype=np.int64)
+    column_conflicts = np.zeros((3, 4096), dtype=np.int64)
+    for line in range(3):
+        for chunk in range(4096):
+            tiles = [(chunk >> (4 * i)) & 15 for i in range(3)]
+            in_row, in_column = [], []
+            for i, tile in enumerate(tiles):
+                if not 1 <= tile <= 8:
+                    continue
+                (goal_row, goal_column) = divmod(tile - 1, 3)
+                row_manhattan[line][chunk] += abs(goal_row - line) + abs(goal_column - i)
+                if goal_row == line:
+                    in_row.append(goal_column)
+                if goal_column == line:
+                    in_column.append(goal_row)
+            row_conflicts[line][chunk] = _line_conflicts(in_row)
+            column_conflicts[line][chunk] = _line_conflicts(in_column)
+    return row_manhattan, row_conflicts, column_conflicts
+
+
+(_ROW_MANHATTAN, _ROW_CONFLICTS, _COLUMN_CONFLICTS) = _eight_puzzle_line_tables()
+# Linear conflict: each tile that must leave its goal line to let another pass costs two more moves.
+_ROW_LINEAR_CONFLICT = _ROW_MANHATTAN + 2 * _ROW_CONFLICTS
+_COLUMN_LINEAR_CONFLICT = 2 * _COLUMN_CONFLICTS
+# Python lists of the same tables, which index faster than arrays one value at a time
+(ROW_MANHATTAN_0, ROW_MANHATTAN_1, ROW_MANHATTAN_2) = _ROW_MANHATTAN.tolist()
+(ROW_LINEAR_CONFLICT_0, ROW_LINEAR_CONFLICT_1, ROW_LINEAR_CONFLICT_2) = _ROW_LINEAR_CONFLICT.tolist()
+(COLUMN_LINEAR_CONFLICT_0, COLUMN_LINEAR_CONFLICT_1, COLUMN_LINEAR_CONFLICT_2) = _COLUMN_LINEAR_CONFLICT.tolist()
+
+
+def eight_puzzle_manhattan(state, search_space):
+    """Sum of the tiles' Manhattan distances from their goal squares, for a packed board."""
+    return ROW_MANHATTAN_0[state & 0xFFF] + ROW_MANHATTAN_1[(state >> 12) & 0xFFF] + ROW_MANHATTAN_2[state >> 24]
+
+
+def eight_puzzle_linear_conflict(state, search_space):
+    """Manhattan distance plus two moves per tile that must step out of its goal row or column, for a packed board."""
+    spread_0 = state & 0xF00F00F
+    spread_1 = (state >> 4) & 0xF00F00F
+    spread_2 = (state >> 8) & 0xF00F00F
+    return (
+        ROW_LINEAR_CONFLICT_0[state & 0xFFF]
+        + ROW_LINEAR_CONFLICT_1[(state >> 12) & 0xFFF]
+        + ROW_LINEAR_CONFLICT_2[state >> 24]
+        + COLUMN_LINEAR_CONFLICT_0[(spread_0 | spread_0 >> 8 | spread_0 >> 16) & 0xFFF]
+        + COLUMN_LINEAR_CONFLICT_1[(spread_1 | spread_1 >> 8 | spread_1 >> 16) & 0xFFF]
+        + COLUMN_LINEAR_CONFLICT_2[(spread_2 | spread_2 >> 8 | spread_2 >> 16) & 0xFFF]
+    )
+
+
+def eight_puzzle_manhattan_batch(states):
+    """eight_puzzle_manhattan of every packed board in states, as an int64 array."""
+    boards = np.asarray(states, dtype=np.int64)
+    return _ROW_MANHATTAN[0][boards & 0xFFF] + _ROW_MANHATTAN[1][(boards >> 12) & 0xFFF] + _ROW_MANHATTAN[2][boards >> 24]
+
+
+def eight_puzzle_linear_conflict_batch(states):
+    """eight_puzzle_linear_conflict of every packed board in states, as an int64 array."""
+    boards = np.asarray(states, dtype=np.int64)
+    h = (
+        _ROW_LINEAR_CONFLICT[0][boards & 0xFFF]
+        + _ROW_LINEAR_CONFLICT[1][(boards >> 12) & 0xFFF]
+        + _ROW_LINEAR_CONFLICT[2][boards >> 24]
+    )
+    for column in range(3):
+        spread = (boards >> (4 * column)) & 0xF00F00F
+        h += _COLUMN_LINEAR_CONFLICT[column][(spread | spread >> 8 | spread >> 16) & 0xFFF]
+    return h
+
+
 def helperdist(search_space, a, b):
     # Try cache first
     if (a, b) in search_space.dist:
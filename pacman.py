@@ -1,4 +1,5 @@
 import argparse
+from profiling import Profile
 from zzz_pacman import readCommand, runGames
 
 def main():
@@ -15,6 +16,23 @@ def main():
         required=True,
         help="Search algorithm, i.e. 'bfs', 'dfs', 'ucs', or 'astar'",
     )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        metavar="PREFIX",
+        help="Profile the run and write PREFIX.pstats, PREFIX.txt, PREFIX.phases.txt and PREFIX.collapsed",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Search even if the plan cache holds a plan for this maze and algorithm",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Play the game without graphics",
+    )
     args = parser.parse_args()
     mazes = {
         "tricky": "trickySearch",
@@ -31,8 +49,14 @@ def main():
         "astar": "a_star_search"
     }
     pacman_args = ["-l", mazes[args.maze], "-p", "SearchAgent", "-a", 
-                   f"fn={algorithms[args.algorithm]},prob=FoodSearchProblem,heuristic=foodHeuristic"]
-    runGames(**readCommand(pacman_args))
+                   f"fn={algorithms[args.algorithm]},prob=FoodSearchProblem,heuristic=foodHeuristic,cache={not args.no_cache}"]
+    if args.quiet:
+        pacman_args.append("-q")
+    if args.profile is None:
+        runGames(**readCommand(pacman_args))
+    else:
+        with Profile(args.profile):
+            runGames(**readCommand(pacman_args))
 
 if __name__ == "__main__":
     main()
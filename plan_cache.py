@@ -0,0 +1,207 @@
+"""Content-addressed on-disk cache of search plans.
+
+SearchAgent looks its plan up here before building the search problem, so
+rerunning the same job skips both the distance precomputation and the
+search. A plan is keyed by a hash of the layout text, the problem class,
+the search function and heuristic names, and a fingerprint of the source
+files they (and search.py) are defined in, so editing the search or
+heuristic code invalidates old plans. The least recently used plans are
+evicted once the cache grows past its size limit.
+
+The cache lives in .plan_cache next to this file, or in $PACMAN_PLAN_CACHE:
+
+> python plan_cache.py list
+> python plan_cache.py clear
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+
+DEFAULT_DIRECTORY = os.environ.get(
+    "PACMAN_PLAN_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".plan_cache")
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_file_hashes = {}  # path -> (mtime, size, digest)
+
+
+def _file_digest(path):
+    stat = os.stat(path)
+    cached = _file_hashes.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _file_hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def _repository_modules(objects):
+    """The modules defining objects, and every repository module they reach through their globals."""
+    repository = os.path.dirname(os.path.abspath(__file__))
+    found, pending = {}, []
+    for obj in objects:
+        module = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+        if module is not None:
+            pending.append(module)
+    while pending:
+        module = pending.pop()
+        path = getattr(module, "__file__", None)
+        if path is None or module.__name__ in found:
+            continue
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != repository:
+            continue  # only the repository's own code is fingerprinted
+        found[module.__name__] = path
+        for value in list(vars(module).values()):
+            if inspect.ismodule(value):
+                pending.append(value)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                dependency = inspect.getmodule(value)
+                if dependency is not None:
+                    pending.append(dependency)
+    return found
+
+
+def source_fingerprint(*objects):
+    """Hash of the source of the given functions/classes and of all repository code they can reach.
+
+    Following module globals means that editing e.g. heuristics.py
+    invalidates plans found with a heuristic that merely wraps one of its
+    functions. search.py is always included.
+    """
+    import search
+
+    modules = _repository_modules((search,) + tuple(obj for obj in objects if obj is not None))
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        digest.update(name.encode())
+        digest.update(_file_digest(modules[name]).encode())
+    return digest.hexdigest()
+
+
+def plan_key(layout_text, problem, algorithm, heuristic=None, fingerprint=""):
+    """Cache key of a plan: the sha256 of everything that determines it."""
+    if not isinstance(layout_text, str):
+        layout_text = "\n".join(layout_text)
+    description = json.dumps(
+        {
+            "layout": layout_text,
+            "problem": problem,
+            "algorithm": algorithm,
+            "heuristic": heuristic,
+            "fingerprint": fingerprint,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+class PlanCache:
+    """Plans stored as small JSON files named by their key.
+
+    Parameters
+    ----------
+    directory : str
+        Where the plans are kept (created as needed)
+    max_bytes : int
+        Size the cache is trimmed back to, least recently used plans first
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """The cached entry for key (a dict with "actions" and "cost"), or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return entry
+
+    def put(self, key, actions, cost=None, **info):
+        """Stores a plan, along with any descriptive info (problem, algorithm, ...)."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = dict(info, actions=list(actions), cost=cost, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(entry, f)
+        os.replace(temporary, path)
+        self.evict()
+
+    def entries(self):
+        """(key, path, bytes, last used) of every cached plan, most recently used first."""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.endswith(".json"):
+                    path = os.path.join(shard_path, name)
+                    stat = os.stat(path)
+                    found.append((name[: -len(".json")], path, stat.st_size, stat.st_mtime))
+        found.sort(key=lambda entry: (-entry[3], entry[0]))
+        return found
+
+    def size(self):
+        return sum(entry[2] for entry in self.entries())
+
+    def evict(self):
+        """Removes least recently used plans until the cache fits in max_bytes; returns how many were removed."""
+        entries = self.entries()
+        total = sum(entry[2] for entry in entries)
+        removed = 0
+        while entries and total > self.max_bytes:
+            (_, path, size, _) = entries.pop()
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Removes every cached plan; returns how many there were."""
+        entries = self.entries()
+        for (_, path, _, _) in entries:
+            os.remove(path)
+        return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the search plan cache")
+    parser.add_argument("command", choices=["list", "clear", "size"], help="What to do with the cache")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="Cache directory")
+    args = parser.parse_args(argv)
+    cache = PlanCache(args.dir)
+    if args.command == "list":
+        print(f"{'key':<14}{'problem':<22}{'algorithm':<24}{'heuristic':<18}{'length':>7}{'cost':>7}  created")
+        for key, path, size, used in cache.entries():
+            with open(path) as f:
+                entry = json.load(f)
+            print(
+                f"{key[:12]:<14}{str(entry.get('problem')):<22}{str(entry.get('algorithm')):<24}"
+                f"{str(entry.get('heuristic')):<18}{len(entry['actions']):>7}{str(entry.get('cost')):>7}  {entry.get('created')}"
+            )
+    elif args.command == "size":
+        entries = cache.entries()
+        print(f"{len(entries)} plans, {sum(entry[2] for entry in entries)} bytes in {cache.directory}")
+    elif args.command == "clear":
+        print(f"Removed {cache.clear()} plans from {cache.directory}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
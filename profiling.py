@@ -0,0 +1,175 @@
+"""Profiling for pacman.py, eightpuzzle.py and slidingpuzzle.py (their --profile option).
+
+    with Profile("profiles/tricky") as profile:
+        runGames(**args)
+
+writes, next to the given path prefix:
+
+  - PREFIX.pstats     the raw cProfile data, for pstats or snakeviz
+  - PREFIX.txt        every profiled function with its call count and time
+  - PREFIX.phases.txt wall time of each phase marked with phase(), such as
+                      layout load or search, with and without nested phases
+  - PREFIX.collapsed  "caller;callee;... microseconds" lines, the input of
+                      flamegraph.pl and speedscope
+
+Functions are named by file path relative to the repository (or to the
+sys.path entry they were imported from) and every file is sorted, so two
+profiles of the same run differ only in their timings.
+"""
+import cProfile
+import contextlib
+import os
+import pstats
+import re
+import sys
+import time
+
+REPOSITORY = os.path.dirname(os.path.abspath(__file__))
+
+# Deepest call stack written to the collapsed-stack file
+MAX_STACK_DEPTH = 64
+
+# Call paths worth less than this are folded into the stack they branch off from
+MIN_STACK_SECONDS = 1e-4
+
+_active = None  # the Profile currently recording phases, if any
+
+
+def phase(name):
+    """Context manager that times a phase of the run when a Profile is active (and does nothing otherwise)."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.phase(name)
+
+
+def function_label(function):
+    """A stable name for a pstats function key (filename, line, name)."""
+    (filename, line, name) = function
+    if filename == "~":
+        # a built-in, e.g. "<built-in method builtins.len>", without object addresses
+        return re.sub(r" at 0x[0-9a-f]+", "", name)
+    path = os.path.abspath(filename)
+    roots = [REPOSITORY] + sorted((os.path.abspath(entry) for entry in sys.path if entry), key=len, reverse=True)
+    for root in roots:
+        if path.startswith(root + os.sep):
+            path = os.path.relpath(path, root)
+            break
+    else:
+        path = os.path.basename(path)
+    return f"{path.replace(os.sep, '/')}:{line}({name})"
+
+
+class Profile:
+    """Profiles the code run inside a with block and writes the reports on exit.
+
+    Parameters
+    ----------
+    prefix : str
+        Path prefix of the report files (directories are created as needed)
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.profiler = cProfile.Profile()
+        self.phases = {}  # name -> [calls, inclusive seconds, exclusive seconds]
+        self._stack = []  # [name, started, seconds spent in nested phases]
+
+    def __enter__(self):
+        global _active
+        _active = self
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        self.profiler.disable()
+        _active = None
+        self.write()
+        return False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            totals = self.phases.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] += elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def write(self):
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats = pstats.Stats(self.profiler)
+        stats.dump_stats(self.prefix + ".pstats")
+        with open(self.prefix + ".txt", "w") as f:
+            f.write(self.function_report(stats))
+        with open(self.prefix + ".phases.txt", "w") as f:
+            f.write(self.phase_report())
+        with open(self.prefix + ".collapsed", "w") as f:
+            f.writelines(f"{stack} {weight}\n" for stack, weight in collapsed_stacks(stats))
+
+    def phase_report(self):
+        lines = [f"{'phase':<32}{'calls':>7}{'seconds':>10}{'self':>10}"]
+        for name, (calls, inclusive, exclusive) in self.phases.items():
+            lines.append(f"{name:<32}{calls:>7}{inclusive:>10.3f}{exclusive:>10.3f}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def function_report(stats):
+        rows = []
+        for function, (primitive_calls, calls, total, cumulative, callers) in stats.stats.items():
+            rows.append((cumulative, total, calls, primitive_calls, function_label(function)))
+        # By name rather than time, so the lines of two runs match up
+        rows.sort(key=lambda row: row[4])
+        lines = [f"{'cumtime':>10}{'tottime':>10}{'ncalls':>14}  function"]
+        for cumulative, total, calls, primitive_calls, label in rows:
+            count = str(calls) if calls == primitive_calls else f"{calls}/{primitive_calls}"
+            lines.append(f"{cumulative:>10.4f}{total:>10.4f}{count:>14}  {label}")
+        return "\n".join(lines) + "\n"
+
+
+def collapsed_stacks(stats):
+    """Sorted (stack, microseconds) pairs of self time along each call path, from the pstats call graph.
+
+    pstats keeps only caller -> callee edges, not whole stacks, so each
+    function's self time is split among its callers in proportion to its
+    self time under each of them, and from there up the graph in proportion
+    to the callers' cumulative time. Callers already on the path (recursion)
+    are skipped, and paths worth less than MIN_STACK_SECONDS stop where they
+    are, so the weights still add up to the total profiled time.
+    """
+    labels = {function: function_label(function) for function in stats.stats}
+    weights = {}
+
+    def climb(function, path, on_path, seconds, first):
+        callers = stats.stats[function][4]
+        # Self time is split by each caller's share of it, higher frames by cumulative time.
+        options = [(caller, edge[2] if first else edge[3]) for caller, edge in callers.items() if caller not in on_path]
+        total = sum(share for caller, share in options)
+        if first and total <= 0:
+            options = [(caller, edge[3]) for caller, edge in callers.items() if caller not in on_path]
+            total = sum(share for caller, share in options)
+        leftover = seconds
+        if total > 0 and len(path) < MAX_STACK_DEPTH:
+            for caller, share in options:
+                part = seconds * share / total
+                if part >= MIN_STACK_SECONDS and caller in stats.stats:
+                    climb(caller, path + (labels[caller],), on_path | {caller}, part, False)
+                    leftover -= part
+        microseconds = round(leftover * 1e6)
+        if microseconds > 0:
+            key = ";".join(reversed(path))
+            weights[key] = weights.get(key, 0) + microseconds
+
+    for function, (_, _, total, _, _) in stats.stats.items():
+        if total > 0:
+            climb(function, (labels[function],), frozenset([function]), total, True)
+    return sorted(weights.items())
@@ -1,10 +1,33 @@
 from abc import ABC, abstractmethod
-from queue import LifoQueue, Queue
-from queue import PriorityQueue
-import random
-from tqdm import tqdm
+from array import array
+from queue import Empty, LifoQueue, Queue
+import heapq
+import multiprocessing
+import time
+import weakref
+from collections import OrderedDict
 
 class SearchSpace(ABC):
+    """A search problem: start state, goal test and successor function.
+
+    Spaces may also provide a compact integer encoding of their states, which
+    search_template then uses for its closed set:
+      encode(state) -> int     a distinct non-negative int per state
+      decode(code) -> state    the inverse of encode
+      state_count() -> int     (optional) an upper bound on the codes, letting
+                               the closed set be a bitset
+
+    Spaces whose moves can be searched backwards (see bidirectional_search)
+    provide:
+      get_predecessors(state)  (predecessor, action, stepCost) triples, where
+                               action leads from predecessor to state
+      get_goal_states()        every goal state
+
+    Spaces that can cheaply build some complete plan provide a starting
+    incumbent for anytime_a_star_search:
+      greedy_plan()            (actions, cost) of a valid but not necessarily
+                               optimal plan, or None if none was found
+    """
 
     @abstractmethod
     def get_start_state(self):
@@ -29,71 +52,1873 @@ class SearchSpace(ABC):
         the incremental cost of expanding to that successor.
         """
 
+    def get_successors_batch(self, states):
+        """
+          states: list of search states
+        Returns one get_successors list per state, in order. Spaces can
+        override this to expand many states with a single vectorized call.
+        """
+        return [self.get_successors(state) for state in states]
+
+
+
+class BitSet:
+    """A set of integers in range(size), stored as one bit each in a bytearray."""
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, size):
+        self.bits = bytearray((size + 7) >> 3)
+        self.count = 0
+
+    def __contains__(self, code):
+        return self.bits[code >> 3] >> (code & 7) & 1 == 1
+
+    def add(self, code):
+        byte = code >> 3
+        mask = 1 << (code & 7)
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+
+# Dense closed sets are used up to this many states (a 32 MB bitset).
+DENSE_STATE_LIMIT = 1 << 28
+
+
+def closed_set_for(space):
+    """Returns (closed set, key function) for the states of space.
+
+    Spaces with encode() get a set of ints (or a BitSet when state_count() is
+    small enough); other spaces get a set of the states themselves and a key
+    function of None.
+    """
+    encode = getattr(space, "encode", None)
+    if encode is None:
+        return set(), None
+    state_count = getattr(space, "state_count", None)
+    if state_count is not None and state_count() <= DENSE_STATE_LIMIT:
+        return BitSet(state_count()), encode
+    return set(), encode
+
+
+class NodeArena:
+    """Array-backed store of search-tree nodes.
+
+    Every node is an integer index into three parallel arrays holding its
+    parent index, the id of the action that led to it and its path cost g.
+    Actions are interned, so a node costs a few bytes no matter how deep it is,
+    and the action sequence is only materialised once, by `path`.
+    """
+
+    __slots__ = ("parents", "action_ids", "costs", "actions", "action_index")
+
+    ROOT = -1
+
+    def __init__(self):
+        self.parents = array("q")
+        self.action_ids = array("i")
+        self.costs = array("d")
+        self.actions = []  # action id -> action
+        self.action_index = {}  # action -> action id
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, parent, action, g):
+        """Stores a node reached from `parent` by `action` and returns its index."""
+        if action is None:
+            action_id = -1
+        else:
+            action_id = self.action_index.get(action)
+            if action_id is None:
+                action_id = self.action_index[action] = len(self.actions)
+                self.actions.append(action)
+        self.parents.append(parent)
+        self.action_ids.append(action_id)
+        self.costs.append(g)
+        return len(self.parents) - 1
+
+    def path(self, node):
+        """Returns the tuple of actions leading from the root to `node`."""
+        actions, parents, action_ids = self.actions, self.parents, self.action_ids
+        solution = []
+        while action_ids[node] != -1:
+            solution.append(actions[action_ids[node]])
+            node = parents[node]
+        solution.reverse()
+        return tuple(solution)
+
+
+class SearchBudgetExceeded(Exception):
+    """Raised when a search runs out of its node or time budget before finding any plan."""
+
+    def __init__(self, expanded):
+        super().__init__(f"search budget exhausted after {expanded} expansions without a plan")
+        self.expanded = expanded
+
+
+def _budget_check(max_nodes, deadline):
+    """Returns a function of the expansion count that is True once the budget is spent, or None without a budget.
+
+    deadline is an absolute time.time() value; the clock is read on every expansion, which is cheap next to
+    an expansion and keeps searches with expensive heuristics from overshooting it.
+    """
+    if max_nodes is None and deadline is None:
+        return None
+    if max_nodes is None:
+        max_nodes = float("inf")
+    if deadline is None:
+        return lambda expanded: expanded > max_nodes
+    return lambda expanded: expanded > max_nodes or time.time() > deadline
+
+
+class SearchResult:
+    """Outcome of a search together with the statistics gathered while running it."""
+
+    def __init__(self, actions, cost, statistics):
+        self.actions = actions
+        self.cost = cost
+        self.statistics = statistics
+
+    @property
+    def found(self):
+        return self.actions is not None
+
+    def as_dict(self):
+        return {
+            "found": self.found,
+            "length": None if self.actions is None else len(self.actions),
+            "cost": self.cost,
+            **self.statistics.as_dict(),
+        }
+
+    def __repr__(self):
+        return f"SearchResult(found={self.found}, cost={self.cost}, expanded={self.statistics.expanded})"
+
+
+class SearchProgress:
+    """Where a search_steps search stands when it yields."""
+
+    def __init__(self, expanded, frontier, elapsed):
+        self.expanded = expanded
+        self.frontier = frontier
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"SearchProgress(expanded={self.expanded}, frontier={self.frontier}, elapsed={self.elapsed:.2f})"
+
+
+class SearchObserver:
+    """Receives events from a running search. Every hook is a no-op by default.
+
+    Searches only pay for instrumentation when an observer is attached; with
+    observer=None none of these hooks are called and nothing is timed.
+    """
+
+    def on_start(self, space):
+        pass
+
+    def on_expand(self, state, g, frontier_size):
+        """Called once per distinct state popped from the frontier."""
+
+    def on_generate(self, count):
+        """Called after an expansion with the number of successors pushed."""
+
+    def on_duplicate(self, state):
+        """Called when a popped state has already been expanded."""
+
+    def on_successors(self, seconds):
+        """Called with the time spent in one get_successors call."""
+
+    def on_heuristic(self, seconds):
+        """Called with the time spent in one heuristic call."""
+
+    def on_iteration(self, threshold, expanded):
+        """Called by iterative searches after each pass with its bound and node count."""
+
+    def on_improvement(self, actions, cost, bound):
+        """Called by anytime searches whenever they find a strictly cheaper plan, with its proven suboptimality bound."""
+
+    def on_bound(self, bound):
+        """Called by anytime searches when they prove a tighter suboptimality bound for the plan they already have."""
+
+    def on_worker_finish(self, worker, expanded, generated):
+        """Called by parallel searches with the node counts of each worker process."""
+
+    def on_drop(self, count):
+        """Called by memory-bounded searches when they discard count nodes."""
+
+    def on_winner(self, name, cost):
+        """Called by portfolio searches with the configuration whose plan is returned."""
+
+    def on_saved_pushes(self, count):
+        """Called just before on_finish by searches on an IndexedPriorityQueue with the pushes decrease-key saved."""
+
+    def on_finish(self, actions, cost):
+        """Called once the search ends; actions is None if no goal was found."""
 
 
-def search_template(space, container, heuristic_fn=lambda state, space: 0):
+class ObserverGroup(SearchObserver):
+    """Forwards every event to several observers."""
+
+    def __init__(self, *observers):
+        self.observers = observers
+
+    def on_start(self, space):
+        for observer in self.observers:
+            observer.on_start(space)
+
+    def on_expand(self, state, g, frontier_size):
+        for observer in self.observers:
+            observer.on_expand(state, g, frontier_size)
+
+    def on_generate(self, count):
+        for observer in self.observers:
+            observer.on_generate(count)
+
+    def on_duplicate(self, state):
+        for observer in self.observers:
+            observer.on_duplicate(state)
+
+    def on_successors(self, seconds):
+        for observer in self.observers:
+            observer.on_successors(seconds)
+
+    def on_heuristic(self, seconds):
+        for observer in self.observers:
+            observer.on_heuristic(seconds)
+
+    def on_iteration(self, threshold, expanded):
+        for observer in self.observers:
+            observer.on_iteration(threshold, expanded)
+
+    def on_improvement(self, actions, cost, bound):
+        for observer in self.observers:
+            observer.on_improvement(actions, cost, bound)
+
+    def on_bound(self, bound):
+        for observer in self.observers:
+            observer.on_bound(bound)
+
+    def on_worker_finish(self, worker, expanded, generated):
+        for observer in self.observers:
+            observer.on_worker_finish(worker, expanded, generated)
+
+    def on_drop(self, count):
+        for observer in self.observers:
+            observer.on_drop(count)
+
+    def on_winner(self, name, cost):
+        for observer in self.observers:
+            observer.on_winner(name, cost)
+
+    def on_saved_pushes(self, count):
+        for observer in self.observers:
+            observer.on_saved_pushes(count)
+
+    def on_finish(self, actions, cost):
+        for observer in self.observers:
+            observer.on_finish(actions, cost)
+
+
+class SearchStatistics(SearchObserver):
+    """Counts and timings for a single search; `result` holds the SearchResult once it ends."""
+
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicate_pops = 0
+        self.peak_frontier = 0
+        self.successor_time = 0.0
+        self.heuristic_time = 0.0
+        self.iterations = []  # (threshold, nodes expanded) per pass of an iterative search
+        self.improvements = []  # (cost, suboptimality bound, nodes expanded) per plan of an anytime search
+        self.suboptimality_bound = None
+        self.worker_expanded = []  # nodes expanded by each worker of a parallel search
+        self.dropped = 0  # nodes discarded by a memory-bounded search
+        self.winner = None  # configuration whose plan a portfolio search returned
+        self.saved_pushes = None  # frontier pushes avoided by decrease-key (IndexedPriorityQueue searches only)
+        self.started = None
+        self.elapsed = 0.0
+        self.result = None
+
+    def on_start(self, space):
+        self.started = time.perf_counter()
+
+    def on_expand(self, state, g, frontier_size):
+        self.expanded += 1
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+
+    def on_generate(self, count):
+        self.generated += count
+
+    def on_duplicate(self, state):
+        self.duplicate_pops += 1
+
+    def on_successors(self, seconds):
+        self.successor_time += seconds
+
+    def on_heuristic(self, seconds):
+        self.heuristic_time += seconds
+
+    def on_iteration(self, threshold, expanded):
+        self.iterations.append((threshold, expanded))
+
+    def on_improvement(self, actions, cost, bound):
+        self.improvements.append((cost, bound, self.expanded))
+        self.suboptimality_bound = bound
+
+    def on_bound(self, bound):
+        self.suboptimality_bound = bound
+
+    def on_worker_finish(self, worker, expanded, generated):
+        self.expanded += expanded
+        self.generated += generated
+        self.worker_expanded.append(expanded)
+
+    def on_drop(self, count):
+        self.dropped += count
+
+    def on_winner(self, name, cost):
+        self.winner = name
+
+    def on_saved_pushes(self, count):
+        self.saved_pushes = count
+
+    def on_finish(self, actions, cost):
+        self.elapsed = time.perf_counter() - self.started
+        self.result = SearchResult(actions, cost, self)
+
+    @property
+    def nodes_per_second(self):
+        return self.expanded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicate_pops": self.duplicate_pops,
+            "peak_frontier": self.peak_frontier,
+            "successor_time": self.successor_time,
+            "heuristic_time": self.heuristic_time,
+            "iterations": len(self.iterations),
+            "suboptimality_bound": self.suboptimality_bound,
+            "dropped": self.dropped,
+            "winner": self.winner,
+            "saved_pushes": self.saved_pushes,
+            "elapsed": self.elapsed,
+            "nodes_per_second": self.nodes_per_second,
+        }
+
+
+class TqdmObserver(SearchObserver):
+    """Shows a tqdm progress bar of expanded nodes (requires the tqdm package)."""
+
+    def __init__(self, **tqdm_kwargs):
+        from tqdm import tqdm
+
+        self.progress_bar = tqdm(**tqdm_kwargs)
+
+    def on_expand(self, state, g, frontier_size):
+        self.progress_bar.update(1)
+
+    def on_finish(self, actions, cost):
+        self.progress_bar.close()
+
+
+def _timed(fn, report):
+    """Wraps fn so that the duration of every call is passed to report."""
+    perf_counter = time.perf_counter
+
+    def timed_fn(*args):
+        started = perf_counter()
+        value = fn(*args)
+        report(perf_counter() - started)
+        return value
+
+    return timed_fn
+
+
+def _frontier_size(container):
+    return container.qsize() if hasattr(container, "qsize") else len(container)
+
+
+def null_heuristic(state, space):
+    """The trivial heuristic: always zero. Searches skip calling it altogether."""
+    return 0
+
+
+nullHeuristic = null_heuristic
+
+
+class HeuristicCache:
+    """Bounded LRU memoization of a heuristic, keyed by state.
+
+    Wrap an expensive heuristic (e.g. food_heuristic_mst) and pass the cache
+    wherever the heuristic is expected. `hits` and `misses` count lookups.
+    The wrapped heuristic must not depend on anything but the state.
+    """
+
+    def __init__(self, heuristic, maxsize=100000):
+        self.heuristic = heuristic
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, state, space):
+        values = self.values
+        value = values.get(state)
+        if value is not None:
+            self.hits += 1
+            values.move_to_end(state)
+            return value
+        self.misses += 1
+        value = values[state] = self.heuristic(state, space)
+        if len(values) > self.maxsize:
+            values.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.values.clear()
+        self.hits = self.misses = 0
+
+
+def search_template(
+    space, container, heuristic_fn=None, observer=None, max_nodes=None, deadline=None, batch_size=1, checkpoint=None
+):
     """General-purpose algorithmic template for search, e.g. DFS or BFS.
 
+    Nodes are (state, g, h, node) tuples, where node indexes a NodeArena that
+    records how the state was reached; the solution path is rebuilt from the
+    arena only once the goal is popped.
+
     Parameters
     ----------
     space : SearchSpace
         The search space
-    container : queue.Queue or queue.LifoQueue or PriorityQueueWithFunction (defined below)
+    container : queue.Queue or queue.LifoQueue or IndexedPriorityQueue (defined below)
         The container for processing nodes of the search tree.
     heuristic_fn : function that takes a search state and a SearchSpace and returns a non-negative number
-        The heuristic function (defaults to a function that always returns zero)
+        The heuristic function. None or null_heuristic means h = 0 everywhere, without any calls.
+    observer : SearchObserver or None
+        Receives expansion events and timings (see SearchStatistics, TqdmObserver)
+    max_nodes, deadline : int or None, float or None
+        Optional budget: the most states to expand, and an absolute time.time()
+        by which to stop. SearchBudgetExceeded is raised when it runs out.
+    batch_size : int
+        How many nodes to pop before expanding them together with
+        space.get_successors_batch (falling back to get_successors one state
+        at a time when the space has no batch method). Batching leaves BFS
+        unchanged; with a LIFO container it explores siblings in a different
+        order.
+    checkpoint : checkpoint.SearchCheckpoint or None
+        Periodically snapshots the frontier, closed set and statistics to
+        disk, and resumes from an existing snapshot.
+    """
+    steps = search_steps(space, container, heuristic_fn, observer, max_nodes, deadline, batch_size, checkpoint, every=None)
+    try:
+        while True:
+            next(steps)
+    except StopIteration as stop:
+        return stop.value
+
+
+def search_steps(
+    space,
+    container,
+    heuristic_fn=None,
+    observer=None,
+    max_nodes=None,
+    deadline=None,
+    batch_size=1,
+    checkpoint=None,
+    every=1000,
+):
+    """search_template as a generator that yields a SearchProgress every `every` expansions.
+
+    The plan is the generator's return value (StopIteration.value, or the
+    result of `yield from`). The caller decides between steps whether to go on,
+    so a game loop can redraw, report progress or give up at a deadline
+    without signals or threads; closing the generator cancels the search
+    (saving a last snapshot when a checkpoint is given). With every=None
+    it never yields. See run_search_steps for a simple driver.
     """
-    visited = set()
-    initial_node = (space.get_start_state(), 0, 0, tuple())
-    container.put(initial_node)
-    count = 0
-    progress_bar = tqdm()
+    get_successors = space.get_successors
+    get_successors_batch = None
+    if batch_size > 1:
+        get_successors_batch = getattr(space, "get_successors_batch", None)
+    out_of_budget = _budget_check(max_nodes, deadline)
+    expanded = 0
+    if heuristic_fn is null_heuristic:
+        heuristic_fn = None
+    if observer is not None:
+        observer.on_start(space)
+        get_successors = _timed(get_successors, observer.on_successors)
+        if get_successors_batch is not None:
+            get_successors_batch = _timed(get_successors_batch, observer.on_successors)
+        if heuristic_fn is not None:
+            heuristic_fn = _timed(heuristic_fn, observer.on_heuristic)
+    # Containers with decrease-key let us drop non-improving successors before computing h
+    is_improvement = getattr(container, "is_improvement", None)
+    # With an encoding, the closed set holds ints (or bits) instead of states.
+    visited, encode = closed_set_for(space)
+    arena = NodeArena()
+    snapshot = None if checkpoint is None else checkpoint.load()
+    if snapshot is not None:
+        expanded = checkpoint.restore(snapshot, space, container, visited, arena, observer)
+    else:
+        initial_node = (space.get_start_state(), 0, 0, arena.add(NodeArena.ROOT, None, 0))
+        container.put(initial_node)
+    saved_pushes = getattr(container, "saved_pushes", None)
+
+    def finish(actions, cost):
+        if observer is not None:
+            if saved_pushes is not None:
+                observer.on_saved_pushes(container.saved_pushes)
+            observer.on_finish(actions, cost)
+
+    started = time.perf_counter()
+    next_step = expanded + every if every is not None else None
     while not container.empty():
-        (q, g, h, solution) = container.get()
-        if q not in visited:
-            count += 1
-            progress_bar.update(1)
-            visited.add(q)
+        if checkpoint is not None and checkpoint.due(expanded):
+            checkpoint.save(space, container, visited, arena, expanded, observer)
+        if next_step is not None and expanded >= next_step:
+            next_step = expanded + every
+            try:
+                yield SearchProgress(expanded, _frontier_size(container), time.perf_counter() - started)
+            except GeneratorExit:
+                # Cancelled: keep a snapshot to resume from, and tell the observer the search ended without a plan.
+                if checkpoint is not None:
+                    checkpoint.save(space, container, visited, arena, expanded, observer)
+                finish(None, None)
+                raise
+        # Pop up to batch_size unexpanded nodes, goal-testing each as it is popped.
+        batch = []
+        while len(batch) < batch_size and not container.empty():
+            (q, g, h, node) = container.get()
+            key = q if encode is None else encode(q)
+            if key in visited:
+                if observer is not None:
+                    observer.on_duplicate(q)
+                continue
+            visited.add(key)
+            expanded += 1
+            if out_of_budget is not None:
+                if out_of_budget(expanded):
+                    finish(None, None)
+                    raise SearchBudgetExceeded(expanded - 1)
+            if observer is not None:
+                observer.on_expand(q, g, _frontier_size(container))
             if space.is_final_state(q):
-                progress_bar.close()
-                print(f"Search nodes visited: {count}")
+                solution = arena.path(node)
+                if checkpoint is not None:
+                    checkpoint.finish()
+                finish(solution, g)
                 return solution
-            successors = space.get_successors(q)
+            batch.append((q, g, node))
+        if get_successors_batch is None:
+            successor_lists = [get_successors(q) for (q, g, node) in batch]
+        else:
+            successor_lists = get_successors_batch([q for (q, g, node) in batch])
+        for (q, g, node), successors in zip(batch, successor_lists):
+            pushed = 0
             for next_state, action, cost in successors:
-                h = heuristic_fn(next_state, space)
-                successor_node = (next_state, g + cost, h, solution + (action,))
-                container.put(successor_node)
+                # Only states that will actually be pushed get a heuristic value.
+                if (next_state if encode is None else encode(next_state)) in visited:
+                    continue
+                next_g = g + cost
+                if is_improvement is not None and not is_improvement(next_state, next_g):
+                    continue
+                h = 0 if heuristic_fn is None else heuristic_fn(next_state, space)
+                container.put((next_state, next_g, h, arena.add(node, action, next_g)))
+                pushed += 1
+            if observer is not None:
+                observer.on_generate(pushed)
+    if checkpoint is not None:
+        checkpoint.finish()
+    finish(None, None)
+
+
+def run_search_steps(steps, deadline=None, on_progress=None):
+    """Drives a search_steps generator to the end and returns its plan.
+
+    on_progress, if given, is called with each SearchProgress. Once
+    time.time() passes deadline (checked at each step) the search is
+    cancelled and SearchBudgetExceeded raised.
+    """
+    try:
+        while True:
+            progress = next(steps)
+            if on_progress is not None:
+                on_progress(progress)
+            if deadline is not None and time.time() > deadline:
+                steps.close()
+                raise SearchBudgetExceeded(progress.expanded)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _search_or_steps(space, container, heuristic_fn=None, steps=None, **kwargs):
+    """search_template, or the search_steps generator yielding every `steps` expansions when steps is given."""
+    if steps is None:
+        return search_template(space, container, heuristic_fn, **kwargs)
+    return search_steps(space, container, heuristic_fn, every=steps, **kwargs)
+
 
+def run_with_statistics(search_fn, space, *args, observer=None, **kwargs):
+    """Runs search_fn(space, ...) with a SearchStatistics attached and returns its SearchResult.
 
-def depth_first_search(problem):
-    return search_template(problem, LifoQueue())
+    Any extra observer (e.g. a TqdmObserver) receives the same events.
+    """
+    statistics = SearchStatistics()
+    if observer is not None:
+        observer = ObserverGroup(statistics, observer)
+    else:
+        observer = statistics
+    search_fn(space, *args, observer=observer, **kwargs)
+    return statistics.result
+
+
+def depth_first_search(problem, observer=None, batch_size=1, checkpoint=None, steps=None):
+    return _search_or_steps(
+        problem, LifoQueue(), observer=observer, batch_size=batch_size, checkpoint=checkpoint, steps=steps
+    )
+
+
+def breadth_first_search(
+    problem,
+    observer=None,
+    batch_size=1,
+    checkpoint=None,
+    external=False,
+    ram_budget=256 * 1024 * 1024,
+    tmpdir=None,
+    steps=None,
+):
+    """Breadth-first search.
+
+    With external=True the layers and closed set are kept in sorted files
+    under tmpdir instead of in memory, buffering about ram_budget bytes of
+    successors at a time (see external_search.py); the space must then
+    provide encode, decode and state_count.
+
+    Like the other search_template searches, with steps=N it returns a
+    search_steps generator that yields every N expansions instead of
+    running to the end (see run_search_steps).
+    """
+    if external:
+        if steps is not None:
+            raise ValueError("external breadth-first search cannot be run in steps")
+        from external_search import external_breadth_first_search
 
+        return external_breadth_first_search(problem, ram_budget=ram_budget, tmpdir=tmpdir, observer=observer)
+    return _search_or_steps(
+        problem, Queue(), observer=observer, batch_size=batch_size, checkpoint=checkpoint, steps=steps
+    )
 
-def breadth_first_search(problem):
-    return search_template(problem, Queue())
 
+class IndexedPriorityQueue:
+    """Lock-free binary-heap open list with decrease-key.
 
-class PriorityQueueWithFunction:
-    def __init__(self, priority_fn):
-        self.queue = PriorityQueue()
+    Unlike a plain priority queue, at most one node per state is kept in the
+    heap: pushing a state that is already queued either replaces the queued node
+    in place (when the new node has a lower priority) or is dropped.
+    `saved_pushes` counts the pushes a queue without decrease-key would have
+    made and this one did not.
+
+    Parameters
+    ----------
+    priority_fn : function that takes a search node and returns a number
+        The priority of a node (lower is popped first)
+    tie_break : str
+        How to order nodes of equal priority: "high_g" (prefer deeper nodes,
+        the default), "low_g", "fifo" or "lifo". Ties are always broken
+        deterministically.
+    """
+
+    TIE_BREAKS = ("high_g", "low_g", "fifo", "lifo")
+
+    def __init__(self, priority_fn, tie_break="high_g"):
+        if tie_break not in self.TIE_BREAKS:
+            raise ValueError(f"tie_break must be one of {self.TIE_BREAKS}, not {tie_break!r}")
         self.priority_fn = priority_fn
+        self.tie_break = tie_break
+        self.heap = []  # entries are [key, node]
+        self.index = {}  # state -> position of its entry in self.heap
+        self.counter = 0
+        self.saved_pushes = 0
+
+    def _key(self, node):
+        self.counter += 1
+        if self.tie_break == "high_g":
+            secondary = -node[1]
+        elif self.tie_break == "low_g":
+            secondary = node[1]
+        elif self.tie_break == "lifo":
+            secondary = -self.counter
+        else:
+            secondary = 0
+        return (self.priority_fn(node), secondary, self.counter)
+
+    def entries(self):
+        """The heap as a list of (key, node) pairs, for checkpointing."""
+        return [(key, node) for key, node in self.heap]
+
+    def restore(self, entries, counter, saved_pushes):
+        """Replaces the contents with entries previously returned by entries()."""
+        self.heap = [[key, node] for key, node in entries]
+        self.index = {node[0]: i for i, (key, node) in enumerate(self.heap)}
+        self.counter = counter
+        self.saved_pushes = saved_pushes
+
+    def is_improvement(self, state, g):
+        """Returns False (and counts a saved push) if state is already queued with cost <= g."""
+        i = self.index.get(state)
+        if i is not None and self.heap[i][1][1] <= g:
+            self.saved_pushes += 1
+            return False
+        return True
 
     def put(self, item):
-        prioritized_item = (self.priority_fn(item) + random.random() / 1000000, item)
-        self.queue.put((prioritized_item, item))
+        state = item[0]
+        key = self._key(item)
+        i = self.index.get(state)
+        if i is None:
+            self.heap.append([key, item])
+            self.index[state] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+            return
+        self.saved_pushes += 1
+        if key[0] < self.heap[i][0][0]:
+            self.heap[i] = [key, item]
+            self._sift_up(i)
 
     def get(self):
-        (_, item) = self.queue.get()
+        heap = self.heap
+        last = heap.pop()
+        if heap:
+            (_, item) = heap[0]
+            heap[0] = last
+            self.index[last[1][0]] = 0
+            self._sift_down(0)
+        else:
+            item = last[1]
+        del self.index[item[0]]
         return item
 
     def empty(self):
-        return self.queue.empty()
+        return not self.heap
+
+    def qsize(self):
+        return len(self.heap)
+
+    def _sift_up(self, i):
+        heap, index = self.heap, self.index
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[i] = heap[parent]
+            index[heap[i][1][0]] = i
+            i = parent
+        heap[i] = entry
+        index[entry[1][0]] = i
+
+    def _sift_down(self, i):
+        heap, index = self.heap, self.index
+        n = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if entry[0] <= heap[child][0]:
+                break
+            heap[i] = heap[child]
+            index[heap[i][1][0]] = i
+            i = child
+        heap[i] = entry
+        index[entry[1][0]] = i
+
+
+def uniform_cost_search(problem, tie_break="high_g", observer=None, checkpoint=None, steps=None):
+    container = IndexedPriorityQueue(lambda x: x[1], tie_break)
+    return _search_or_steps(problem, container, observer=observer, checkpoint=checkpoint, steps=steps)
+
+
+def a_star_search(
+    problem,
+    heuristic,
+    tie_break="high_g",
+    observer=None,
+    weight=1.0,
+    max_nodes=None,
+    deadline=None,
+    checkpoint=None,
+    steps=None,
+):
+    """A* search, or weighted A* (f = g + weight * h) when weight > 1.
+
+    With an admissible heuristic the plan costs at most `weight` times the
+    optimum. max_nodes and deadline (an absolute time.time()) bound the
+    search; SearchBudgetExceeded is raised if they run out before a plan is
+    found. See anytime_a_star_search for a search that keeps a plan in hand.
+    """
+    if weight == 1:
+        container = IndexedPriorityQueue(lambda x: x[1] + x[2], tie_break)
+    else:
+        container = IndexedPriorityQueue(lambda x: x[1] + weight * x[2], tie_break)
+    return _search_or_steps(
+        problem,
+        container,
+        heuristic,
+        observer=observer,
+        max_nodes=max_nodes,
+        deadline=deadline,
+        checkpoint=checkpoint,
+        steps=steps,
+    )
+
+
+def anytime_a_star_search(
+    problem, heuristic, initial_weight=3.0, weight_step=0.5, observer=None, max_nodes=None, deadline=None
+):
+    """Anytime repairing A* (ARA*).
+
+    Runs weighted A* with weight initial_weight to get a plan quickly, then
+    repeatedly lowers the weight by weight_step, reusing the previous search
+    effort, until the plan is proven optimal or the budget (max_nodes
+    expansions in total, or the absolute time.time() deadline) runs out. The
+    best plan found so far is returned; the suboptimality bound it was proven
+    to satisfy is reported through observer.on_improvement for each cheaper
+    plan and observer.on_bound when a later pass tightens it (see
+    SearchStatistics.suboptimality_bound). The heuristic must be admissible
+    for the bound to hold. If the space provides greedy_plan, that plan is
+    the first incumbent, so a plan is returned however soon the budget runs
+    out; otherwise SearchBudgetExceeded is raised if the budget runs out
+    before any plan is found.
+    """
+    get_successors = problem.get_successors
+    if observer is not None:
+        observer.on_start(problem)
+        get_successors = _timed(get_successors, observer.on_successors)
+        heuristic = _timed(heuristic, observer.on_heuristic)
+    out_of_budget = _budget_check(max_nodes, deadline)
+
+    start = problem.get_start_state()
+    g = {start: 0}
+    h = {start: heuristic(start, problem)}
+    parents = {start: (None, None)}
+    weight = initial_weight
+    counter = 0
+    open_list = [(weight * h[start], 0, counter, start)]
+    closed, inconsistent = set(), set()
+    incumbent, incumbent_cost = None, float("inf")
+    seed_actions = None  # the greedy_plan incumbent, until the search finds a cheaper plan
+    if problem.is_final_state(start):
+        incumbent, incumbent_cost = start, 0
+    elif hasattr(problem, "greedy_plan"):
+        seed = problem.greedy_plan()
+        if seed is not None:
+            seed_actions, incumbent_cost = seed
+    # Admissible lower bound on the optimal cost, tightened after every completed pass.
+    lower_bound = h[start]
+    best_actions = None
+    reported_cost = reported_bound = float("inf")
+    proven_weight = float("inf")
+    expanded = 0
+
+    def extract_path(state):
+        actions = []
+        while parents[state][0] is not None:
+            state, action = parents[state]
+            actions.append(action)
+        actions.reverse()
+        return tuple(actions)
+
+    def report(proven_weight):
+        """The proven suboptimality bound of the incumbent; only strictly cheaper plans reach on_improvement."""
+        nonlocal best_actions, reported_cost, reported_bound
+        best_actions = seed_actions if incumbent is None else extract_path(incumbent)
+        if lower_bound > 0:
+            bound = incumbent_cost / lower_bound
+        else:
+            bound = 1.0 if incumbent_cost == 0 else float("inf")
+        bound = max(1.0, min(proven_weight, bound))
+        if observer is not None:
+            if incumbent_cost < reported_cost:
+                observer.on_improvement(best_actions, incumbent_cost, bound)
+            elif bound < reported_bound:
+                observer.on_bound(bound)
+        reported_cost, reported_bound = incumbent_cost, bound
+        return bound
+
+    def finish(actions, cost):
+        if observer is not None:
+            observer.on_finish(actions, cost)
+        return actions
+
+    while True:
+        # ImprovePath: weighted A* until the incumbent is no worse than every open f-value.
+        while open_list and open_list[0][0] < incumbent_cost:
+            (f, _, _, state) = heapq.heappop(open_list)
+            if state in closed or f != g[state] + weight * h[state]:
+                continue  # stale entry
+            closed.add(state)
+            expanded += 1
+            if out_of_budget is not None and out_of_budget(expanded):
+                if incumbent_cost == float("inf"):
+                    finish(None, None)
+                    raise SearchBudgetExceeded(expanded - 1)
+                report(proven_weight)
+                return finish(best_actions, incumbent_cost)
+            if observer is not None:
+                observer.on_expand(state, g[state], len(open_list))
+            pushed = 0
+            for next_state, action, cost in get_successors(state):
+                next_g = g[state] + cost
+                if next_g >= g.get(next_state, float("inf")):
+                    continue
+                g[next_state] = next_g
+                parents[next_state] = (state, action)
+                if next_state not in h:
+                    h[next_state] = heuristic(next_state, problem)
+                if next_g < incumbent_cost and problem.is_final_state(next_state):
+                    incumbent, incumbent_cost = next_state, next_g
+                if next_state in closed:
+                    inconsistent.add(next_state)
+                else:
+                    counter += 1
+                    heapq.heappush(open_list, (next_g + weight * h[next_state], -next_g, counter, next_state))
+                    pushed += 1
+            if observer is not None:
+                observer.on_generate(pushed)
+
+        open_states = {entry[3] for entry in open_list if entry[3] not in closed} | inconsistent
+        if open_states:
+            lower_bound = max(lower_bound, min(g[s] + h[s] for s in open_states))
+        elif incumbent_cost < float("inf"):
+            lower_bound = incumbent_cost  # the whole reachable space has been searched
+        if observer is not None:
+            observer.on_iteration(weight, expanded)
+        if incumbent_cost == float("inf"):
+            return finish(None, None)
+        proven_weight = weight
+        if report(proven_weight) <= 1.0:
+            return finish(best_actions, incumbent_cost)
+        # Lower the weight and move the inconsistent states back onto the open list.
+        weight = max(1.0, weight - weight_step)
+        open_list = []
+        for state in open_states:
+            counter += 1
+            open_list.append((g[state] + weight * h[state], -g[state], counter, state))
+        heapq.heapify(open_list)
+        closed, inconsistent = set(), set()
+
+
+
+OPPOSITE_ACTIONS = {"North": "South", "South": "North", "East": "West", "West": "East"}
+
+
+def undo_pruning(previous_action, action):
+    """Move pruning rule for compass moves: never immediately undo the previous move."""
+    return OPPOSITE_ACTIONS.get(previous_action) == action
+
+
+def _contour_search(problem, heuristic, bound, unit_cost, prune, observer):
+    """Depth-first search of every path whose f = g + h stays within bound.
+
+    Only the current path is kept in memory, and states already on it are
+    skipped (in-path cycle checking). Returns (actions, cost, expanded,
+    next_bound), where actions is None if no goal lies within the bound and
+    next_bound is the smallest f value that exceeded it.
+    """
+    get_successors = problem.get_successors
+    if observer is not None:
+        get_successors = _timed(get_successors, observer.on_successors)
+        heuristic = _timed(heuristic, observer.on_heuristic)
+    start = problem.get_start_state()
+    if observer is not None:
+        observer.on_expand(start, 0, 1)
+    if problem.is_final_state(start):
+        return (), 0, 1, bound
+    path_states = [start]
+    path_costs = [0]
+    on_path = {start}
+    actions = []
+    stack = [iter(get_successors(start))]
+    expanded = 1
+    next_bound = float("inf")
+    while stack:
+        try:
+            next_state, action, cost = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            on_path.discard(path_states.pop())
+            path_costs.pop()
+            if actions:
+                actions.pop()
+            continue
+        if next_state in on_path:
+            continue
+        if prune is not None and actions and prune(actions[-1], action):
+            continue
+        g = path_costs[-1] + (1 if unit_cost else cost)
+        f = g + heuristic(next_state, problem)
+        if f > bound:
+            if f < next_bound:
+                next_bound = f
+            continue
+        path_states.append(next_state)
+        path_costs.append(g)
+        on_path.add(next_state)
+        actions.append(action)
+        expanded += 1
+        if observer is not None:
+            observer.on_expand(next_state, g, len(path_states))
+        if problem.is_final_state(next_state):
+            return tuple(actions), g, expanded, next_bound
+        successors = get_successors(next_state)
+        if observer is not None:
+            observer.on_generate(len(successors))
+        stack.append(iter(successors))
+    return None, None, expanded, next_bound
+
+
+def _iterative_deepening(problem, heuristic, unit_cost, prune, max_bound, observer):
+    if observer is not None:
+        observer.on_start(problem)
+    bound = heuristic(problem.get_start_state(), problem)
+    while bound <= max_bound:
+        actions, cost, expanded, next_bound = _contour_search(problem, heuristic, bound, unit_cost, prune, observer)
+        if observer is not None:
+            observer.on_iteration(bound, expanded)
+        if actions is not None:
+            if observer is not None:
+                observer.on_finish(actions, cost)
+            return actions
+        if next_bound == float("inf"):
+            break  # nothing was cut off by the bound: the whole space has been searched without a goal
+        bound = next_bound
+    if observer is not None:
+        observer.on_finish(None, None)
+    return None
+
+
+def iterative_deepening_search(problem, prune=None, max_depth=float("inf"), observer=None):
+    """Iterative-deepening depth-first search (IDDFS).
+
+    Runs depth-limited DFS with limits 0, 1, 2, ... so that memory stays
+    linear in the solution depth, and returns a shortest solution in number of
+    actions. prune(previous_action, action) can veto moves, e.g. undo_pruning.
+    """
+    return _iterative_deepening(problem, lambda state, space: 0, True, prune, max_depth, observer)
+
+
+def ida_star_search(problem, heuristic, prune=None, max_threshold=float("inf"), observer=None):
+    """Iterative-deepening A* (IDA*).
+
+    Repeats a cost-bounded depth-first search, raising the f = g + h threshold
+    to the smallest value that exceeded it on the previous pass. Memory stays
+    linear in the solution depth; with an admissible heuristic the solution is
+    optimal. prune(previous_action, action) can veto moves, e.g. undo_pruning.
+    """
+    return _iterative_deepening(problem, heuristic, False, prune, max_threshold, observer)
 
 
-def uniform_cost_search(problem):
-    return search_template(problem, PriorityQueueWithFunction(lambda x: x[1]))
+def _owner_function(problem, workers):
+    """Maps a state to the worker that owns it, by its encoding when the space has one."""
+    encode = getattr(problem, "encode", None)
+    if encode is None:
+        return lambda state: hash(state) % workers
+    return lambda state: encode(state) % workers
 
 
-def a_star_search(problem, heuristic):
-    return search_template(problem, PriorityQueueWithFunction(lambda x: x[1] + x[2]), heuristic)
+def _hda_worker(me, problem, heuristic, inboxes, results, batch_size):
+    """One process of parallel_a_star_search: A* over the states whose hash it owns.
 
+    Messages on the inbox are ("nodes", [(state, g, parent, action), ...]),
+    ("incumbent", cost), ("probe", wave), ("trace", state) and ("stop",).
+    Successors owned by other workers are buffered and sent in batches.
+    """
+    workers = len(inboxes)
+    inbox = inboxes[me]
+    infinity = float("inf")
+    g, h, parents = {}, {}, {}
+    open_list = []
+    outboxes = [[] for _ in range(workers)]
+    counter = sent = received = expanded = generated = 0
+    incumbent = infinity
+    active = True  # whether nodes arrived since the last termination probe
+    # States arrive pickled from other processes, so they are looked up by encoding when there is one.
+    key = getattr(problem, "encode", None) or (lambda state: state)
+
+    def insert(state, cost, parent, action):
+        nonlocal counter
+        state_key = key(state)
+        if cost < g.get(state_key, infinity):
+            g[state_key] = cost
+            parents[state_key] = (parent, action)
+            if state_key not in h:
+                h[state_key] = heuristic(state, problem)
+            counter += 1
+            heapq.heappush(open_list, (cost + h[state_key], -cost, counter, state))
+
+    def send(owner):
+        nonlocal sent
+        inboxes[owner].put(("nodes", outboxes[owner]))
+        outboxes[owner] = []
+        sent += 1
+
+    def has_work():
+        # Drop stale entries so the top of the heap is a live node.
+        while open_list and -open_list[0][1] != g[key(open_list[0][3])]:
+            heapq.heappop(open_list)
+        return bool(open_list) and open_list[0][0] < incumbent
+
+    owner_of = _owner_function(problem, workers)
+    start = problem.get_start_state()
+    if owner_of(start) == me:
+        insert(start, 0, None, None)
+    while True:
+        busy = has_work()
+        if not busy:
+            for owner in range(workers):
+                if outboxes[owner]:
+                    send(owner)
+        messages = [] if busy else [inbox.get()]
+        while True:
+            try:
+                messages.append(inbox.get_nowait())
+            except Empty:
+                break
+        for message in messages:
+            kind = message[0]
+            if kind == "nodes":
+                received += 1
+                active = True
+                for state, cost, parent, action in message[1]:
+                    insert(state, cost, parent, action)
+            elif kind == "incumbent":
+                incumbent = min(incumbent, message[1])
+            elif kind == "probe":
+                for owner in range(workers):
+                    if outboxes[owner]:
+                        send(owner)
+                results.put(("probe", me, message[1], sent, received, not has_work(), active))
+                active = False
+            elif kind == "trace":
+                results.put(("parent", message[1], parents[key(message[1])]))
+            elif kind == "stop":
+                results.put(("stats", me, expanded, generated))
+                return
+        for _ in range(batch_size):
+            if not has_work():
+                break
+            (_, negative_g, _, state) = heapq.heappop(open_list)
+            cost = -negative_g
+            expanded += 1
+            if problem.is_final_state(state):
+                incumbent = cost
+                results.put(("solution", cost, state))
+                continue
+            for next_state, action, step_cost in problem.get_successors(state):
+                generated += 1
+                owner = owner_of(next_state)
+                if owner == me:
+                    insert(next_state, cost + step_cost, state, action)
+                else:
+                    outboxes[owner].append((next_state, cost + step_cost, state, action))
+                    if len(outboxes[owner]) >= batch_size:
+                        send(owner)
+
+
+def parallel_a_star_search(problem, heuristic, workers=None, batch_size=64, observer=None):
+    """Hash-distributed A* (HDA*) over a pool of worker processes.
+
+    Every state is owned by worker hash(state) % workers (or encode(state)
+    % workers when the space has an encoding), which keeps its
+    open and closed lists; successors owned by other workers are sent to them
+    in batches. The main process tracks the best plan found so far and stops
+    the workers once all of them are out of nodes with f below its cost and no
+    batches are in flight (detected with repeated waves of counting probes),
+    so the plan is optimal for an admissible heuristic. Works with any search
+    space whose states hash the same in every process; under the default
+    "fork" start method nothing needs to be picklable except the states.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    if observer is not None:
+        observer.on_start(problem)
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    processes = [
+        context.Process(target=_hda_worker, args=(me, problem, heuristic, inboxes, results, batch_size), daemon=True)
+        for me in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        owner_of = _owner_function(problem, workers)
+        best_cost, best_state = float("inf"), None
+        wave, replies, previous_wave = 0, [], None
+        for inbox in inboxes:
+            inbox.put(("probe", wave))
+        while True:
+            message = results.get()
+            if message[0] == "solution":
+                (_, cost, state) = message
+                if cost < best_cost:
+                    best_cost, best_state = cost, state
+                    for inbox in inboxes:
+                        inbox.put(("incumbent", cost))
+            elif message[0] == "probe" and message[2] == wave:
+                replies.append(message)
+                if len(replies) < workers:
+                    continue
+                sent = sum(reply[3] for reply in replies)
+                received = sum(reply[4] for reply in replies)
+                quiet = sent == received and all(reply[5] for reply in replies)
+                if quiet and previous_wave == (sent, received) and not any(reply[6] for reply in replies):
+                    break
+                previous_wave = (sent, received) if quiet else None
+                wave, replies = wave + 1, []
+                if not quiet:
+                    time.sleep(0.001)
+                for inbox in inboxes:
+                    inbox.put(("probe", wave))
+
+        solution = None
+        if best_state is not None:
+            actions = []
+            state = best_state
+            while True:
+                inboxes[owner_of(state)].put(("trace", state))
+                message = results.get()
+                while message[0] != "parent":
+                    message = results.get()
+                (parent, action) = message[2]
+                if parent is None:
+                    break
+                actions.append(action)
+                state = parent
+            actions.reverse()
+            solution = tuple(actions)
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        finished = 0
+        while finished < workers:
+            message = results.get()
+            if message[0] == "stats":
+                finished += 1
+                if observer is not None:
+                    observer.on_worker_finish(message[1], message[2], message[3])
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    if observer is not None:
+        observer.on_finish(solution, None if solution is None else best_cost)
+    return solution
+
+
+def _portfolio_worker(index, search_fn, problem, kwargs, results):
+    """Runs one configuration of portfolio_search and reports its plan, cost and node counts."""
+    statistics = SearchStatistics()
+    try:
+        actions = search_fn(problem, observer=statistics, **kwargs)
+        cost = None if statistics.result is None else statistics.result.cost
+        results.put(("done", index, actions, cost, statistics.expanded, statistics.generated))
+    except Exception as error:
+        results.put(("error", index, f"{type(error).__name__}: {error}"))
+
+
+def default_portfolio(problem, heuristic=None):
+    """(name, search function, keyword arguments, optimal) configurations used when portfolio_search gets none.
+
+    A* with each of the given heuristics (one or a sequence), plus
+    bidirectional search when the space can be searched backwards, or
+    uniform cost search when there is nothing else to run.
+    """
+    if heuristic is None:
+        heuristics = []
+    elif callable(heuristic):
+        heuristics = [heuristic]
+    else:
+        heuristics = list(heuristic)
+    configs = [
+        (f"a_star_search({getattr(h, '__name__', 'heuristic')})", a_star_search, {"heuristic": h}, True)
+        for h in heuristics
+        if h is not null_heuristic
+    ]
+    if hasattr(problem, "get_predecessors") and hasattr(problem, "get_goal_states"):
+        configs.append(("bidirectional_search", bidirectional_search, {}, True))
+    if not configs:
+        configs.append(("uniform_cost_search", uniform_cost_search, {}, True))
+    return configs
+
+
+def portfolio_search(problem, configs=None, workers=None, heuristic=None, deadline=None, observer=None):
+    """Runs several search configurations side by side in separate processes and keeps the best plan.
+
+    configs is a list of (name, search function, keyword arguments, optimal)
+    tuples; optimal says whether the configuration is guaranteed to return
+    an optimal plan (e.g. A* with an admissible heuristic). The first
+    optimal configuration to finish wins and the others are cancelled.
+    Plans from the other configurations are kept as they come in, and the
+    cheapest is returned once all have finished or when time.time() passes
+    deadline; SearchBudgetExceeded is raised if there is none by then.
+    At most `workers` configurations (default: one per CPU) run at once.
+
+    Without configs, default_portfolio(problem, heuristic) is used, so with
+    heuristic=(h1, h2) A* runs with both heuristics and whichever is faster
+    on the layout at hand wins. The observer's on_winner hook (and
+    SearchStatistics.winner) records which configuration that was.
+    """
+    if configs is None:
+        configs = default_portfolio(problem, heuristic)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    if observer is not None:
+        observer.on_start(problem)
+    results = context.Queue()
+    pending = list(range(len(configs)))
+    running = {}
+    best_cost, best_actions, best_index = float("inf"), None, None
+    expanded = 0
+    errors = []
+
+    def launch():
+        while pending and len(running) < workers:
+            index = pending.pop(0)
+            (name, search_fn, kwargs, optimal) = configs[index]
+            process = context.Process(
+                target=_portfolio_worker, args=(index, search_fn, problem, kwargs, results), daemon=True
+            )
+            process.start()
+            running[index] = process
+
+    try:
+        launch()
+        while running:
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.time())
+            if wait <= 0:
+                break
+            try:
+                message = results.get(timeout=wait)
+            except Empty:
+                # A worker that died without reporting (e.g. killed for memory) counts as failed.
+                for index, process in list(running.items()):
+                    if process.exitcode not in (None, 0):
+                        errors.append(f"{configs[index][0]}: exited with code {process.exitcode}")
+                        del running[index]
+                launch()
+                continue
+            index = message[1]
+            running.pop(index).join()
+            if message[0] == "error":
+                errors.append(f"{configs[index][0]}: {message[2]}")
+            else:
+                (_, _, actions, cost, worker_expanded, worker_generated) = message
+                expanded += worker_expanded
+                if observer is not None:
+                    observer.on_worker_finish(configs[index][0], worker_expanded, worker_generated)
+                if actions is not None and cost < best_cost:
+                    best_cost, best_actions, best_index = cost, actions, index
+                if actions is not None and configs[index][3]:
+                    break
+            launch()
+    finally:
+        for process in running.values():
+            process.terminate()
+        for process in running.values():
+            process.join()
+
+    if best_actions is None:
+        if observer is not None:
+            observer.on_finish(None, None)
+        if deadline is not None and time.time() >= deadline:
+            raise SearchBudgetExceeded(expanded)
+        if errors:
+            raise RuntimeError("no portfolio configuration found a plan: " + "; ".join(errors))
+        return None
+    if observer is not None:
+        observer.on_winner(configs[best_index][0], best_cost)
+        observer.on_finish(best_actions, best_cost)
+    return best_actions
+
+
+def beam_search(problem, heuristic, width, observer=None):
+    """Beam search: breadth-first by depth, keeping only the width best nodes (by g + h) per layer.
+
+    The frontier never holds more than width nodes, at the price of
+    completeness and optimality. Discarded nodes are reported through
+    observer.on_drop; when a plan is found, observer.on_improvement receives
+    its cost divided by the lowest f among the discarded and remaining nodes,
+    which bounds its suboptimality for unit-cost spaces and an admissible
+    heuristic. Returns None if the beam runs dry.
+    """
+    if observer is not None:
+        observer.on_start(problem)
+    visited, encode = closed_set_for(problem)
+    arena = NodeArena()
+    start = problem.get_start_state()
+    visited.add(start if encode is None else encode(start))
+    start_h = heuristic(start, problem)
+    beam = [(start, 0, arena.add(NodeArena.ROOT, None, 0))]
+    lower_bound = float("inf")  # lowest f of any discarded node
+    if problem.is_final_state(start):
+        beam = []
+        solution, cost = (), 0
+    else:
+        solution, cost = None, None
+    while beam:
+        candidates = []
+        for state, g, node in beam:
+            if observer is not None:
+                observer.on_expand(state, g, len(beam))
+            successors = problem.get_successors(state)
+            for next_state, action, step_cost in successors:
+                key = next_state if encode is None else encode(next_state)
+                if key in visited:
+                    continue
+                visited.add(key)
+                next_g = g + step_cost
+                next_node = arena.add(node, action, next_g)
+                if problem.is_final_state(next_state) and (cost is None or next_g < cost):
+                    solution, cost = arena.path(next_node), next_g
+                h = heuristic(next_state, problem)
+                candidates.append((next_g + h, h, len(candidates), next_state, next_g, next_node))
+            if observer is not None:
+                observer.on_generate(len(successors))
+        if solution is not None:
+            lower_bound = min([lower_bound] + [entry[0] for entry in candidates])
+            break
+        if len(candidates) > width:
+            candidates.sort()
+            lower_bound = min(lower_bound, candidates[width][0])
+            if observer is not None:
+                observer.on_drop(len(candidates) - width)
+            del candidates[width:]
+        beam = [(state, g, node) for (_, _, _, state, g, node) in candidates]
+    if solution is not None and observer is not None:
+        lower_bound = min(lower_bound, cost)
+        lower_bound = max(lower_bound, start_h)
+        bound = cost / lower_bound if lower_bound > 0 else 1.0
+        observer.on_improvement(solution, cost, max(1.0, bound))
+    if observer is not None:
+        observer.on_finish(solution, cost)
+    return solution
+
+
+class _SMANode:
+    __slots__ = ("state", "key", "parent", "action", "index", "g", "f", "depth",
+                 "successors", "next_index", "children", "forgotten", "version", "__weakref__")
+
+    def __init__(self, state, key, parent, action, index, g, f, depth):
+        self.state = state
+        self.key = key
+        self.parent = parent
+        self.action = action
+        self.index = index  # position among the parent's successors
+        self.g = g
+        self.f = f
+        self.depth = depth
+        self.successors = None  # the (state, action, cost) list, computed on first expansion
+        self.next_index = 0  # successors[:next_index] have been generated at least once
+        self.children = {}  # successor index -> child node in memory
+        self.forgotten = {}  # successor index -> backed-up f of a dropped child
+        self.version = 0  # bumped whenever f changes or the node leaves the open list
+
+
+def sma_star_search(problem, heuristic, max_nodes, observer=None):
+    """Simplified memory-bounded A* (SMA*).
+
+    Never keeps more than max_nodes search nodes. When memory is full the
+    shallowest of the worst (highest-f) leaves is dropped and its f value is
+    backed up into its parent, which will regenerate it if that subtree
+    becomes the most promising again. The plan is optimal whenever an optimal
+    path fits in max_nodes nodes; otherwise the best plan that fits is
+    returned. Drops are reported through observer.on_drop, and the plan's
+    cost against the root's backed-up lower bound through
+    observer.on_improvement. Returns None if no plan fits in memory.
+    """
+    if max_nodes < 2:
+        raise ValueError("sma_star_search needs room for at least two nodes")
+    if observer is not None:
+        observer.on_start(problem)
+    encode = getattr(problem, "encode", None)
+    infinity = float("inf")
+    counter = 0
+    expand_heap, drop_heap = [], []
+    open_nodes = set()
+
+    def key_of(state):
+        return state if encode is None else encode(state)
+
+    def make_open(node):
+        nonlocal counter
+        node.version += 1
+        open_nodes.add(node)
+        counter += 1
+        # Expand the deepest of the best; drop the shallowest of the worst.
+        # Entries hold weak references, so a dropped node is freed at once.
+        ref = weakref.ref(node)
+        heapq.heappush(expand_heap, (node.f, -node.depth, counter, node.version, ref))
+        heapq.heappush(drop_heap, (-node.f, node.depth, counter, node.version, ref))
+        # Each open node has one live entry per heap; purge the stale ones
+        # once they outnumber the live ones.
+        if len(expand_heap) > 2 * max_nodes:
+            expand_heap[:] = [entry for entry in expand_heap if live(entry)]
+            heapq.heapify(expand_heap)
+        if len(drop_heap) > 2 * max_nodes:
+            drop_heap[:] = [entry for entry in drop_heap if live(entry)]
+            heapq.heapify(drop_heap)
+
+    def close(node):
+        node.version += 1
+        open_nodes.discard(node)
+
+    def live(entry):
+        node = entry[4]()
+        return node is not None and entry[3] == node.version and node in open_nodes
+
+    def backup(node):
+        """Sets f of node (and its ancestors) to the least f of its children once all were generated."""
+        while node is not None and node.successors is not None and node.next_index == len(node.successors):
+            values = [child.f for child in node.children.values()] + list(node.forgotten.values())
+            best = min(values) if values else infinity
+            if best == node.f:
+                break
+            node.f = best
+            if node in open_nodes:
+                make_open(node)
+            node = node.parent
+
+    start = problem.get_start_state()
+    root = _SMANode(start, key_of(start), None, None, None, 0, heuristic(start, problem), 0)
+    used = 1
+    make_open(root)
+    solution, cost = None, None
+    while open_nodes:
+        while not live(expand_heap[0]):
+            heapq.heappop(expand_heap)
+        node = expand_heap[0][4]()
+        if node.f == infinity:
+            break
+        if problem.is_final_state(node.state):
+            actions = []
+            walk = node
+            while walk.parent is not None:
+                actions.append(walk.action)
+                walk = walk.parent
+            actions.reverse()
+            solution, cost = tuple(actions), node.g
+            break
+        if node.successors is None:
+            node.successors = problem.get_successors(node.state)
+            if observer is not None:
+                observer.on_expand(node.state, node.g, len(open_nodes))
+                observer.on_generate(len(node.successors))
+        # Generate the next successor: a new one, or else the most promising forgotten one.
+        if node.next_index < len(node.successors):
+            index = node.next_index
+            node.next_index += 1
+            floor = 0
+        elif node.forgotten:
+            index = min(node.forgotten, key=node.forgotten.get)
+            floor = node.forgotten.pop(index)
+        else:
+            index = None
+        if index is not None:
+            next_state, action, step_cost = node.successors[index]
+            next_key = key_of(next_state)
+            on_path = False
+            walk = node
+            while walk is not None:
+                if walk.key == next_key:
+                    on_path = True
+                    break
+                walk = walk.parent
+            g = node.g + step_cost
+            if on_path:
+                f = infinity
+            elif not problem.is_final_state(next_state) and node.depth + 2 >= max_nodes:
+                f = infinity  # too deep for a path to a goal to fit in memory
+            else:
+                f = max(node.f, g + heuristic(next_state, problem), floor)
+            node.children[index] = _SMANode(next_state, next_key, node, action, index, g, f, node.depth + 1)
+            used += 1
+            make_open(node.children[index])
+        if node.next_index == len(node.successors):
+            backup(node)
+            if not node.forgotten and node.children:
+                close(node)
+        # Free memory by dropping the shallowest worst leaf, backing its f up into its parent.
+        while used > max_nodes and drop_heap:
+            entry = heapq.heappop(drop_heap)
+            if not live(entry):
+                continue
+            leaf = entry[4]()
+            if leaf.children or leaf is root:
+                continue  # a node becoming a leaf again is re-pushed by make_open below
+            parent = leaf.parent
+            del parent.children[leaf.index]
+            parent.forgotten[leaf.index] = leaf.f
+            close(leaf)
+            leaf.parent = leaf.successors = None
+            leaf.forgotten.clear()
+            del leaf  # nothing else refers to it now, so it is freed here
+            used -= 1
+            if observer is not None:
+                observer.on_drop(1)
+            backup(parent)
+            make_open(parent)
+    if solution is not None and observer is not None:
+        bound = cost / root.f if root.f > 0 else 1.0
+        observer.on_improvement(solution, cost, max(1.0, bound))
+    if observer is not None:
+        observer.on_finish(solution, cost)
+    return solution
+
+
+def bidirectional_search(problem, observer=None):
+    """Bidirectional Dijkstra search, meeting in the middle.
+
+    Searches forward from the start state and backward from every goal state
+    (problem.get_goal_states) using problem.get_predecessors, always growing
+    the smaller frontier. The best meeting point seen so far fixes a plan of
+    cost mu; the search stops once the smallest forward and backward
+    frontier distances add up to at least mu, which makes the plan optimal for
+    any non-negative step costs. Only about 2 * b^(d/2) nodes are expanded
+    instead of b^d.
+    """
+    if observer is not None:
+        observer.on_start(problem)
+    encode = getattr(problem, "encode", None)
+
+    def key_of(state):
+        return state if encode is None else encode(state)
+
+    infinity = float("inf")
+    counter = 0
+    start = problem.get_start_state()
+    # Per direction: best distances, links towards the start (or goal), closed keys and the open heap.
+    forward = {"dist": {key_of(start): 0}, "link": {key_of(start): None}, "closed": set(), "heap": [(0, 0, start)]}
+    backward = {"dist": {}, "link": {}, "closed": set(), "heap": []}
+    for goal in problem.get_goal_states():
+        counter += 1
+        backward["dist"][key_of(goal)] = 0
+        backward["link"][key_of(goal)] = None
+        backward["heap"].append((0, counter, goal))
+    heapq.heapify(backward["heap"])
+    forward["expand"], backward["expand"] = problem.get_successors, problem.get_predecessors
+    best_cost, meeting = infinity, None
+    if key_of(start) in backward["dist"]:
+        best_cost, meeting = 0, key_of(start)
+
+    def top(side):
+        heap = side["heap"]
+        while heap and key_of(heap[0][2]) in side["closed"]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else infinity
+
+    while True:
+        top_forward, top_backward = top(forward), top(backward)
+        if top_forward + top_backward >= best_cost or infinity in (top_forward, top_backward):
+            break
+        if len(forward["heap"]) <= len(backward["heap"]):
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        (distance, _, state) = heapq.heappop(side["heap"])
+        key = key_of(state)
+        side["closed"].add(key)
+        if observer is not None:
+            observer.on_expand(state, distance, len(forward["heap"]) + len(backward["heap"]))
+        neighbours = side["expand"](state)
+        for next_state, action, cost in neighbours:
+            next_key = key_of(next_state)
+            next_distance = distance + cost
+            if next_distance < side["dist"].get(next_key, infinity):
+                side["dist"][next_key] = next_distance
+                side["link"][next_key] = (key, action)
+                counter += 1
+                heapq.heappush(side["heap"], (next_distance, counter, next_state))
+                if next_key in other["dist"] and next_distance + other["dist"][next_key] < best_cost:
+                    best_cost, meeting = next_distance + other["dist"][next_key], next_key
+        if observer is not None:
+            observer.on_generate(len(neighbours))
+
+    if meeting is None:
+        if observer is not None:
+            observer.on_finish(None, None)
+        return None
+    actions = []
+    key = meeting
+    while forward["link"][key] is not None:
+        key, action = forward["link"][key]
+        actions.append(action)
+    actions.reverse()
+    key = meeting
+    while backward["link"][key] is not None:
+        key, action = backward["link"][key]
+        actions.append(action)
+    solution = tuple(actions)
+    if observer is not None:
+        observer.on_finish(solution, best_cost)
+    return solution
+
+
+# Unit moves on a 4-connected grid, named as in zzz_game.Directions
+GRID_MOVES = {(0, 1): "North", (0, -1): "South", (1, 0): "East", (-1, 0): "West"}
+
+
+def jump_point_search(problem, heuristic=None, observer=None):
+    """Jump point search (JPS) on a 4-connected, uniform-cost grid.
+
+    problem needs a `walls` Grid (indexed walls[x][y], with a wall border),
+    (x, y) states and get_goal_states(), like PositionSearchProblem. Instead
+    of expanding every cell, straight runs are scanned directly on the wall
+    grid and only jump points are expanded: cells where the goal is, where
+    a wall ends beside the run (a forced neighbour), or, on vertical runs,
+    where a horizontal scan finds one. The result is an optimal list of unit
+    moves in the same format as a_star_search.
+
+    When the problem does not report a uniform cost (has_uniform_cost(), e.g.
+    the StayEast/StayWest cost functions), this falls back to a_star_search.
+    The heuristic defaults to the Manhattan distance to the nearest goal.
+    """
+    if not getattr(problem, "has_uniform_cost", lambda: False)():
+        return a_star_search(problem, heuristic if heuristic is not None else null_heuristic, observer=observer)
+    if observer is not None:
+        observer.on_start(problem)
+    walls = problem.walls.data  # walls[x][y]
+    goals = set(problem.get_goal_states())
+    if heuristic is None:
+        def estimate(cell):
+            return min(abs(cell[0] - gx) + abs(cell[1] - gy) for gx, gy in goals)
+    else:
+        def estimate(cell):
+            return heuristic(cell, problem)
+
+    def jump(x, y, dx, dy):
+        """Scans from (x, y) in direction (dx, dy) and returns the next jump point, or None."""
+        while True:
+            x += dx
+            y += dy
+            if walls[x][y]:
+                return None
+            if (x, y) in goals:
+                return (x, y)
+            if dy == 0:
+                if (not walls[x][y + 1] and walls[x - dx][y + 1]) or (not walls[x][y - 1] and walls[x - dx][y - 1]):
+                    return (x, y)
+            else:
+                if (not walls[x + 1][y] and walls[x + 1][y - dy]) or (not walls[x - 1][y] and walls[x - 1][y - dy]):
+                    return (x, y)
+                if jump(x, y, 1, 0) is not None or jump(x, y, -1, 0) is not None:
+                    return (x, y)
+
+    def directions(cell, arrival):
+        """Directions worth scanning from a jump point reached moving in direction arrival."""
+        if arrival is None:
+            return list(GRID_MOVES)
+        (dx, dy) = arrival
+        x, y = cell
+        if dy == 0:
+            pruned = [arrival]
+            for vertical in (1, -1):
+                if not walls[x][y + vertical] and walls[x - dx][y + vertical]:
+                    pruned.append((0, vertical))
+            return pruned
+        return [arrival, (1, 0), (-1, 0)]
+
+    start = problem.get_start_state()
+    g = {start: 0}
+    parents = {start: None}  # jump point -> (previous jump point, direction)
+    counter = 0
+    open_list = [(estimate(start), 0, counter, start, None)]
+    closed = set()
+    solution, cost = None, None
+    while open_list:
+        (f, negative_g, _, cell, arrival) = heapq.heappop(open_list)
+        if cell in closed:
+            continue
+        closed.add(cell)
+        if observer is not None:
+            observer.on_expand(cell, -negative_g, len(open_list))
+        if cell in goals:
+            # Unroll the jumps into unit moves.
+            actions = []
+            while parents[cell] is not None:
+                previous, (dx, dy) = parents[cell]
+                steps = abs(cell[0] - previous[0]) + abs(cell[1] - previous[1])
+                actions.extend([GRID_MOVES[(dx, dy)]] * steps)
+                cell = previous
+            actions.reverse()
+            solution, cost = tuple(actions), -negative_g
+            break
+        pushed = 0
+        for direction in directions(cell, arrival):
+            point = jump(cell[0], cell[1], direction[0], direction[1])
+            if point is None or point in closed:
+                continue
+            next_g = g[cell] + abs(point[0] - cell[0]) + abs(point[1] - cell[1])
+            if next_g < g.get(point, float("inf")):
+                g[point] = next_g
+                parents[point] = (cell, direction)
+                counter += 1
+                heapq.heappush(open_list, (next_g + estimate(point), -next_g, counter, point, direction))
+                pushed += 1
+        if observer is not None:
+            observer.on_generate(pushed)
+    if observer is not None:
+        observer.on_finish(solution, cost)
+    return solution
+
+
+def distance_map(space, source, targets=None):
+    """Costs of the cheapest paths from source to every state reachable from it.
+
+    A single Dijkstra exploration replaces one pairwise search per target:
+    the result maps each settled state to its distance from source. With
+    targets given, exploration stops as soon as all of them are settled (so
+    the map then covers at least the targets that are reachable).
+    """
+    distances = {}
+    remaining = None if targets is None else set(targets)
+    best = {source: 0}
+    counter = 0
+    frontier = [(0, counter, source)]
+    while frontier:
+        (distance, _, state) = heapq.heappop(frontier)
+        if state in distances:
+            continue
+        distances[state] = distance
+        if remaining is not None:
+            remaining.discard(state)
+            if not remaining:
+                break
+        for next_state, action, cost in space.get_successors(state):
+            next_distance = distance + cost
+            if next_state not in distances and next_distance < best.get(next_state, float("inf")):
+                best[next_state] = next_distance
+                counter += 1
+                heapq.heappush(frontier, (next_distance, counter, next_state))
+    return distances
@@ -0,0 +1,372 @@
+"""Sliding-tile puzzles of any size (8-, 15-, 24-puzzle) with additive pattern-database heuristics.
+
+    space = SlidingPuzzleSearchSpace(example_fifteen_puzzles[0])
+    heuristic = PatternDatabaseHeuristic(4)   # the 5-5-5 partition, built on first use
+    actions = ida_star_search(space, heuristic, prune=undo_pruning)
+
+A board is packed into an int like the eight puzzle's (see tileboards),
+with `bits` bits per square: 4 up to the 15-puzzle, 5 for the 24-puzzle.
+The goal has the tiles in order and the blank on the last square.
+
+An additive pattern database (PDB) for a group of tiles stores, for every
+placement of those tiles, the fewest moves *of those tiles* needed to bring
+them home, with the other tiles treated as indistinguishable and their moves
+free. Moves of one group's tiles are not counted by any other group, so the
+values of disjoint groups add up to an admissible heuristic. Each database
+is built once by 0-1 breadth-first search over (tile placement, blank square)
+and stored on disk as one nibble per placement holding
+(pdb - manhattan) / 2, capped at 15: a group's PDB value has the parity of
+its tiles' Manhattan distance and is never below it, so the heuristic is
+manhattan + 2 * the stored nibbles, and the files are memory-mapped as is.
+
+> python slidingpuzzle.py 0 ida
+> python slidingpuzzle.py --size 3 --walk 40 astar
+"""
+import mmap
+import os
+import random
+
+import numpy as np
+
+import profiling
+from search import OPPOSITE_ACTIONS, SearchSpace, a_star_search, ida_star_search, undo_pruning, run_with_statistics
+from tileboards import (
+    BLANK_MOVES,
+    bits_per_square,
+    blank_finder,
+    blank_moves,
+    flatten,
+    move_table,
+    pack as pack_board,
+    run_main,
+    unpack as unpack_board,
+)
+
+DEFAULT_PDB_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pattern_databases")
+
+# Largest value a PDB nibble holds, (pdb - manhattan) / 2
+MAX_NIBBLE = 15
+
+# Tile groups of the default additive PDBs for each board size
+DEFAULT_PATTERNS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 2, 3, 5, 6), (4, 7, 8, 11, 12), (9, 10, 13, 14, 15)),
+    5: ((1, 2, 3, 4), (5, 6, 7, 8), (9, 10, 11, 12), (13, 14, 15, 16), (17, 18, 19, 20), (21, 22, 23, 24)),
+}
+
+
+_manhattan_tables = {}  # size -> manhattan_table(size)
+
+
+def manhattan_table(size):
+    """manhattan_table(size)[tile][square]: Manhattan distance of tile on square from its goal square (built once per size)."""
+    table = _manhattan_tables.get(size)
+    if table is None:
+        table = [[0] * (size * size)]
+        for tile in range(1, size * size):
+            (goal_row, goal_column) = divmod(tile - 1, size)
+            table.append([abs(square // size - goal_row) + abs(square % size - goal_column) for square in range(size * size)])
+        _manhattan_tables[size] = table
+    return table
+
+
+def is_solvable(tiles, size):
+    """Whether the flat board tiles (0 for the blank) can reach the goal."""
+    order = [tile for tile in tiles if tile]
+    inversions = sum(1 for i in range(len(order)) for later in order[i + 1:] if later < order[i])
+    if size % 2:
+        return inversions % 2 == 0
+    blank_row_from_bottom = size - tiles.index(0) // size
+    return (inversions + blank_row_from_bottom) % 2 == 1
+
+
+class SlidingPuzzleSearchSpace(SearchSpace):
+    """The size x size sliding-tile puzzle over packed int boards.
+
+    Parameters
+    ----------
+    board : sequence, tensor or int
+        The initial board: size x size rows, a flat sequence of tiles (0 for
+        the blank), or an already packed int (then size is required)
+    size : int or None
+        Board side, inferred from board when it is not packed
+    """
+
+    def __init__(self, board, size=None):
+        if size is None:
+            if isinstance(board, int):
+                raise ValueError("size is needed for a packed board")
+            tiles = flatten(board)
+            size = int(round(len(tiles) ** 0.5))
+        self.size = size
+        self.squares = size * size
+        self.bits = bits_per_square(size)
+        self.tile_mask = (1 << self.bits) - 1
+        self.move_table = move_table(size)
+        self.blank_square = blank_finder(size)
+        self.goal = self.pack(list(range(1, self.squares)) + [0])
+        self.start = self.pack(board)
+        if sorted(self.unpack(self.start)) != list(range(self.squares)):
+            raise ValueError(f"not a {size}x{size} board: {self.unpack(self.start)}")
+
+    def pack(self, board):
+        """The packed int of a board (rows, flat tiles, or an already packed int)."""
+        return pack_board(board, self.bits)
+
+    def unpack(self, state):
+        """The tiles of a packed board, in row-major order."""
+        return unpack_board(state, self.bits, self.squares)
+
+    def is_solvable(self, state=None):
+        return is_solvable(self.unpack(self.start if state is None else state), self.size)
+
+    def get_start_state(self):
+        return self.start
+
+    def is_final_state(self, state):
+        return state == self.goal
+
+    def encode(self, state):
+        return state
+
+    def decode(self, code):
+        return code
+
+    def state_count(self):
+        return 1 << (self.bits * self.squares)
+
+    def get_successors(self, state):
+        mask = self.tile_mask
+        return [
+            (state + ((state >> shift) & mask) * multiplier, action, 1)
+            for action, shift, multiplier in self.move_table[self.blank_square(state)]
+        ]
+
+    def get_predecessors(self, state):
+        return [(board, OPPOSITE_ACTIONS[action], cost) for board, action, cost in self.get_successors(state)]
+
+    def get_goal_states(self):
+        return [self.goal]
+
+    def random_walk(self, moves, seed=None):
+        """A board moves random blank moves away from the goal (never undoing the previous move)."""
+        rng = random.Random(seed)
+        state, previous = self.goal, None
+        for _ in range(moves):
+            options = [(board, action) for board, action, cost in self.get_successors(state) if OPPOSITE_ACTIONS[action] != previous]
+            (state, previous) = rng.choice(options)
+        return state
+
+
+def _placement_squares(indexes, squares, count):
+    """Squares of the count tiles of each placement index, first tile in the most significant digit."""
+    digits = np.empty((len(indexes), count), dtype=np.int64)
+    for j in range(count - 1, -1, -1):
+        (indexes, digits[:, j]) = np.divmod(indexes, squares)
+    return digits
+
+
+def build_pattern_database(size, tiles):
+    """Nibbles of the additive PDB of a tile group, as bytes (see the module docstring).
+
+    0-1 breadth-first search from the goal over (placement of the tiles,
+    blank square), indexed placement * squares + blank: a blank move into a
+    square no group tile is on costs 0, one that moves a group tile costs 1.
+    Each level is first closed under the free moves, so a state first
+    reached by a costly move is at the next level. The PDB value of a
+    placement is its least distance over blank squares.
+    """
+    squares = size * size
+    count = len(tiles)
+    weights = np.array([squares ** (count - j) for j in range(count)], dtype=np.int64)  # of each tile in a state index
+    moves = blank_moves(size)
+    targets = {action: np.full(squares, -1, dtype=np.int64) for action, dr, dc in BLANK_MOVES}
+    for square, square_moves in enumerate(moves):
+        for action, target in square_moves:
+            targets[action][square] = target
+    distances = np.full(squares ** (count + 1), 255, dtype=np.uint8)
+    start = sum((tile - 1) * int(weight) for tile, weight in zip(tiles, weights)) + squares - 1
+    distances[start] = 0
+    frontier = np.array([start], dtype=np.int64)
+    level = 0
+    while len(frontier):
+        costly = []
+        current = frontier
+        while len(current):
+            free = []
+            placements = _placement_squares(current // squares, squares, count)
+            blanks = current % squares
+            for action in targets:
+                movers = np.flatnonzero(targets[action][blanks] >= 0)
+                target = targets[action][blanks[movers]]
+                occupied = placements[movers] == target[:, None]
+                moved = occupied.any(axis=1)
+                # the blank slides onto an empty square, or swaps with group tile j
+                free.append(current[movers[~moved]] + (target - blanks[movers])[~moved])
+                tile = occupied[moved].argmax(axis=1)
+                shift = (blanks[movers] - target)[moved]
+                costly.append(current[movers[moved]] + shift * weights[tile] - shift)
+            current = np.unique(np.concatenate(free))
+            current = current[distances[current] == 255]
+            distances[current] = level
+        frontier = np.unique(np.concatenate(costly))
+        frontier = frontier[distances[frontier] == 255]
+        level += 1
+        distances[frontier] = level
+    pdb = distances.reshape(-1, squares).min(axis=1).astype(np.int64)
+    placements = _placement_squares(np.arange(len(pdb), dtype=np.int64), squares, count)
+    manhattan = np.array(manhattan_table(size), dtype=np.int64)
+    group_manhattan = sum(manhattan[tile][placements[:, j]] for j, tile in enumerate(tiles))
+    nibbles = np.where(pdb == 255, 0, np.clip((pdb - group_manhattan) // 2, 0, MAX_NIBBLE)).astype(np.uint8)
+    if len(nibbles) % 2:
+        nibbles = np.append(nibbles, np.uint8(0))
+    return (nibbles[0::2] | (nibbles[1::2] << 4)).tobytes()
+
+
+class PatternDatabase:
+    """The memory-mapped nibble file of one tile group's PDB, built the first time it is missing.
+
+    Parameters
+    ----------
+    size : int
+        Board side
+    tiles : tuple of int
+        The tile group
+    directory : str
+        Where PDB files are kept
+    """
+
+    def __init__(self, size, tiles, directory=DEFAULT_PDB_DIRECTORY):
+        self.size = size
+        self.tiles = tuple(tiles)
+        squares = size * size
+        self.weights = [squares ** (len(tiles) - 1 - j) for j in range(len(tiles))]  # of each tile's square
+        self.path = os.path.join(directory, f"{size}x{size}-{'-'.join(map(str, self.tiles))}.pdb")
+        expected = (squares ** len(tiles) + 1) // 2
+        if not os.path.exists(self.path) or os.path.getsize(self.path) != expected:
+            os.makedirs(directory, exist_ok=True)
+            with profiling.phase("pattern database build"):
+                data = build_pattern_database(size, self.tiles)
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self.path)
+        with open(self.path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def nibble(self, placement):
+        """Stored (pdb - manhattan) / 2 of a placement index."""
+        return (self.map[placement >> 1] >> ((placement & 1) << 2)) & 15
+
+    def close(self):
+        self.map.close()
+
+
+class PatternDatabaseHeuristic:
+    """Additive disjoint-PDB heuristic (state, search_space) for SlidingPuzzleSearchSpace boards.
+
+    Parameters
+    ----------
+    size : int
+        Board side
+    patterns : sequence of tile tuples or None
+        Disjoint tile groups (default DEFAULT_PATTERNS[size]); tiles in no
+        group count their Manhattan distance
+    directory : str
+        Where PDB files are kept
+    """
+
+    def __init__(self, size, patterns=None, directory=DEFAULT_PDB_DIRECTORY):
+        patterns = DEFAULT_PATTERNS[size] if patterns is None else patterns
+        grouped = [tile for tiles in patterns for tile in tiles]
+        if len(set(grouped)) != len(grouped) or not set(grouped) <= set(range(1, size * size)):
+            raise ValueError(f"patterns must be disjoint groups of tiles 1..{size * size - 1}")
+        self.size = size
+        self.bits = bits_per_square(size)
+        self.databases = [PatternDatabase(size, tiles, directory) for tiles in patterns]
+        self.manhattan = manhattan_table(size)
+        # tile -> (its database, weight of its square in the placement index), or None
+        self.owners = [None] * (size * size)
+        for d, database in enumerate(self.databases):
+            for tile, weight in zip(database.tiles, database.weights):
+                self.owners[tile] = (d, weight)
+
+    def __call__(self, state, search_space=None):
+        bits = self.bits
+        mask = (1 << bits) - 1
+        manhattan, owners = self.manhattan, self.owners
+        placements = [0] * len(self.databases)
+        h = 0
+        square = 0
+        while state:
+            tile = state & mask
+            if tile:
+                h += manhattan[tile][square]
+                owner = owners[tile]
+                if owner is not None:
+                    placements[owner[0]] += square * owner[1]
+            state >>= bits
+            square += 1
+        for database, placement in zip(self.databases, placements):
+            h += 2 * ((database.map[placement >> 1] >> ((placement & 1) << 2)) & 15)
+        return h
+
+
+def manhattan_heuristic(state, search_space):
+    """Sum of the tiles' Manhattan distances from their goal squares."""
+    manhattan = manhattan_table(search_space.size)
+    return sum(manhattan[tile][square] for square, tile in enumerate(search_space.unpack(state)))
+
+
+# Fifteen-puzzle boards of increasing difficulty; optimal solutions take 30, 36, 44, 46, 50 and 52 moves.
+example_fifteen_puzzles = [
+    [[9, 5, 1, 2], [6, 0, 7, 4], [14, 10, 3, 12], [11, 13, 15, 8]],
+    [[3, 6, 11, 8], [2, 13, 15, 7], [0, 1, 4, 10], [5, 9, 14, 12]],
+    [[4, 9, 11, 2], [13, 10, 15, 5], [3, 1, 0, 7], [14, 6, 12, 8]],
+    [[9, 13, 0, 6], [3, 2, 5, 7], [10, 11, 1, 8], [14, 12, 4, 15]],
+    [[5, 14, 7, 1], [15, 4, 13, 8], [9, 3, 0, 6], [12, 11, 10, 2]],
+    [[13, 5, 9, 8], [3, 4, 12, 0], [15, 14, 6, 2], [11, 10, 1, 7]],
+]
+
+
+def main(argv):
+    usage = "Usage: python slidingpuzzle.py [EXAMPLE] [astar|ida] [--size N] [--walk MOVES] [--seed SEED] [--profile PREFIX]"
+    options = {"--size": 4, "--walk": None, "--seed": 0}
+    positional = []
+    i = 0
+    try:
+        while i < len(argv):
+            if argv[i] in options:
+                options[argv[i]] = int(argv[i + 1])
+                i += 2
+            else:
+                positional.append(argv[i])
+                i += 1
+        algorithm = next((arg for arg in positional if arg in ("astar", "ida")), "ida")
+        numbers = [int(arg) for arg in positional if arg not in ("astar", "ida")]
+        if options["--walk"] is None:
+            board = example_fifteen_puzzles[numbers[0] if numbers else 0]
+            space = SlidingPuzzleSearchSpace(board)
+        else:
+            size = options["--size"]
+            space = SlidingPuzzleSearchSpace(SlidingPuzzleSearchSpace(list(range(size * size))).random_walk(options["--walk"], options["--seed"]), size)
+    except (ValueError, IndexError):
+        print(usage)
+        exit()
+
+    print(space.unpack(space.start))
+    with profiling.phase("pattern databases"):
+        heuristic = PatternDatabaseHeuristic(space.size)
+    print(f"\nRunning {'IDA*' if algorithm == 'ida' else 'A*'} with additive pattern databases:")
+    with profiling.phase("search"):
+        if algorithm == "ida":
+            result = run_with_statistics(ida_star_search, space, heuristic, prune=undo_pruning)
+        else:
+            result = run_with_statistics(a_star_search, space, heuristic)
+    print(f"Search nodes visited: {result.statistics.expanded}")
+    print(f"Solution length: {len(result.actions)}")
+    print(result.actions)
+
+
+if __name__ == "__main__":
+    run_main(main, "slidingpuzzle")
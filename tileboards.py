@@ -0,0 +1,110 @@
+"""Packed int boards of the sliding-tile puzzles, shared by eightpuzzle.py and slidingpuzzle.py.
+
+A size x size board is packed into an int with bits_per_square(size) bits per
+square in row-major order: the tile on square i (0 for the blank) is
+(state >> bits * i) & mask. Moving the blank is then a single addition (see
+move_table), and the blank is found without a loop (see blank_finder).
+
+run_main is the command-line entry point of both modules, with their
+--profile option.
+"""
+import functools
+import sys
+
+import profiling
+
+# Blank moves as (action, row offset, column offset), named by the direction the blank moves
+BLANK_MOVES = (("South", 1, 0), ("North", -1, 0), ("East", 0, 1), ("West", 0, -1))
+
+
+def bits_per_square(size):
+    return max(4, (size * size - 1).bit_length())
+
+
+def field_masks(size):
+    """(ones, highs): the lowest and the highest bit of every square's field, set."""
+    bits = bits_per_square(size)
+    ones = sum(1 << (bits * square) for square in range(size * size))
+    return ones, ones << (bits - 1)
+
+
+def flatten(board):
+    """The tiles of a board given as a tensor/array, a sequence of rows, or a flat sequence."""
+    if hasattr(board, "flatten"):
+        return board.flatten().tolist()
+    board = list(board)
+    if board and hasattr(board[0], "__iter__"):
+        return [int(tile) for row in board for tile in row]
+    return board
+
+
+def pack(board, bits):
+    """The packed int of a board (see flatten), or the board itself if it is already packed."""
+    if isinstance(board, int):
+        return board
+    state = 0
+    for square, tile in enumerate(flatten(board)):
+        state |= int(tile) << (bits * square)
+    return state
+
+
+def unpack(state, bits, squares):
+    """The tiles of a packed board, in row-major order."""
+    mask = (1 << bits) - 1
+    return [(state >> (bits * square)) & mask for square in range(squares)]
+
+
+def _zero_field(ones, highs, bits, state):
+    # The lowest flagged field of this zero-field test is always the real zero.
+    flags = (state - ones) & ~state & highs
+    return ((flags & -flags).bit_length() - 1) // bits
+
+
+def blank_finder(size):
+    """A function returning the blank's square on a packed size x size board: the one zero field.
+
+    It is a partial of a module-level function, so spaces holding it can still be pickled.
+    """
+    return functools.partial(_zero_field, *field_masks(size), bits_per_square(size))
+
+
+def blank_moves(size):
+    """For each square: (action, square the blank moves to) of every legal blank move, in BLANK_MOVES order."""
+    moves = []
+    for square in range(size * size):
+        (row, column) = divmod(square, size)
+        moves.append(
+            tuple(
+                (action, (row + dr) * size + column + dc)
+                for action, dr, dc in BLANK_MOVES
+                if 0 <= row + dr < size and 0 <= column + dc < size
+            )
+        )
+    return tuple(moves)
+
+
+def move_table(size):
+    """For each blank square: (action, shift of the square the blank moves to, multiplier moving its tile into the blank).
+
+    The successor is state + tile * multiplier, with tile = (state >> shift) & mask.
+    """
+    bits = bits_per_square(size)
+    return tuple(
+        tuple(
+            (action, bits * target, (1 << (bits * square)) - (1 << (bits * target)))
+            for action, target in moves
+        )
+        for square, moves in enumerate(blank_moves(size))
+    )
+
+
+def run_main(main, default_prefix, argv=None):
+    """Runs main(argv) on the command-line arguments, under a profiling.Profile with --profile [PREFIX]."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if "--profile" not in argv:
+        return main(argv)
+    i = argv.index("--profile")
+    prefix = argv[i + 1] if i + 1 < len(argv) else default_prefix
+    del argv[i : i + 2]
+    with profiling.Profile(prefix):
+        return main(argv)
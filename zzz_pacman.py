@@ -46,6 +46,7 @@ from zzz_game import Actions
 from zzz_util import nearestPoint
 from zzz_util import manhattanDistance
 import zzz_util, zzz_layout
+import profiling
 import sys, types, time, random, os
 
 ###################################################
@@ -534,7 +535,8 @@ def readCommand( argv ):
     if options.fixRandomSeed: random.seed('cs188')
 
     # Choose a layout
-    args['layout'] = zzz_layout.getLayout( options.layout )
+    with profiling.phase("layout load"):
+        args['layout'] = zzz_layout.getLayout( options.layout )
     if args['layout'] == None: raise Exception("The layout " + options.layout + " cannot be found")
 
     # Choose a Pacman agent
@@ -558,10 +560,10 @@ def readCommand( argv ):
 
     # Choose a display format
     if options.quietGraphics:
-        import textDisplay
+        import zzz_textDisplay as textDisplay
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
-        import textDisplay
+        import zzz_textDisplay as textDisplay
         textDisplay.SLEEP_TIME = options.frameTime
         args['display'] = textDisplay.PacmanGraphics()
     else:
@@ -638,14 +640,15 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
         beQuiet = i < numTraining
         if beQuiet:
                 # Suppress output and graphics
-            import textDisplay
+            import zzz_textDisplay as textDisplay
             gameDisplay = textDisplay.NullGraphics()
             rules.quiet = True
         else:
             gameDisplay = display
             rules.quiet = False
         game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
-        game.run()
+        with profiling.phase("game playback"):
+            game.run()
         if not beQuiet: games.append(game)
 
         if record:
@@ -11,7 +11,7 @@
 # Student side autograding was added by Brad Miller, Nick Hay, and
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 from food import PacmanFoodSearchSpace
-from heuristics import food_heuristic
+from heuristics import food_heuristic, food_heuristic_mst
 
 """
 This file contains all of the agents that can be selected to control Pacman.  To
@@ -39,8 +39,11 @@ from zzz_game import Directions
 from zzz_game import Agent
 from zzz_game import Actions
 import zzz_util
+import inspect
 import time
 import search
+import profiling
+import plan_cache
 
 
 class GoWestAgent(Agent):
@@ -73,6 +76,21 @@ class SearchAgent(Agent):
       depth_first_search or dfs
       breadth_first_search or bfs
 
+    With timeLimit (seconds), search functions that can run in steps are
+    cancelled once it runs out, e.g. -a fn=a_star_search,timeLimit=5. Those
+    that take a deadline (a_star_search) check it on every expansion; the
+    others are checked between slices of 1000 expansions. The cancellation is
+    raised as search.SearchBudgetExceeded, which the game (run with -c)
+    treats as the agent crashing.
+
+    fn=portfolio_search races several configurations in parallel; several
+    heuristics can be given joined by "+", e.g.
+    -a fn=portfolio_search,prob=FoodSearchProblem,heuristic=foodHeuristic+foodHeuristicMST
+
+    Plans are saved in the plan cache (see plan_cache.py) and reused when
+    the layout, problem, search function, heuristic and their source code
+    are all unchanged; -a cache=False always searches afresh.
+
 
     Note: You should NOT change any code in SearchAgent
     """
@@ -82,6 +100,8 @@ class SearchAgent(Agent):
         fn="depth_first_search",
         prob="PositionSearchProblem",
         heuristic="nullHeuristic",
+        timeLimit=None,
+        cache=True,
     ):
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
@@ -89,22 +109,36 @@ class SearchAgent(Agent):
         if fn not in dir(search):
             raise AttributeError(fn + " is not a search function in search.py.")
         func = getattr(search, fn)
-        if "heuristic" not in func.__code__.co_varnames:
+        parameters = inspect.signature(func).parameters
+        heur = None
+        if "heuristic" not in parameters:
             print("searching using function " + fn)
             self.searchFunction = func
         else:
-            if heuristic in globals().keys():
-                heur = globals()[heuristic]
-            elif heuristic in dir(search):
-                heur = getattr(search, heuristic)
-            else:
-                raise AttributeError(
-                    heuristic
-                    + " is not a function in searchAgents.py or search.py."
-                )
+            heurs = []
+            for name in heuristic.split("+"):
+                if name in globals().keys():
+                    heurs.append(globals()[name])
+                elif name in dir(search):
+                    heurs.append(getattr(search, name))
+                else:
+                    raise AttributeError(
+                        name
+                        + " is not a function in searchAgents.py or search.py."
+                    )
+            # Several heuristics are passed on as a tuple (for portfolio_search)
+            heur = heurs[0] if len(heurs) == 1 else tuple(heurs)
             print("Searching using %s" % (fn,))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            self.searchFunction = lambda x, **kwargs: func(x, heuristic=heur, **kwargs)
+        # Search functions that accept an observer report their node counts
+        self.reportsStatistics = "observer" in parameters
+        # Search functions that take a deadline or run in steps can be stopped at the time limit
+        self.takesDeadline = "deadline" in parameters
+        self.takesSteps = "steps" in parameters
+        self.timeLimit = None
+        if timeLimit is not None and (self.takesDeadline or self.takesSteps):
+            self.timeLimit = float(timeLimit)
 
         # Get the search problem type from the name
         if prob not in globals().keys():
@@ -114,6 +148,17 @@ class SearchAgent(Agent):
         self.searchType = globals()[prob]
         #print("[SearchAgent] using problem type " + prob)
 
+        # What identifies a plan in the plan cache, besides the layout
+        self.planCache = None
+        if str(cache).lower() not in ("false", "0", "no"):
+            self.planCache = plan_cache.PlanCache()
+            self.planDescription = {
+                "problem": prob,
+                "algorithm": fn,
+                "heuristic": None if heur is None else heuristic,
+            }
+            self.planSources = (func, self.searchType) + (heur if isinstance(heur, tuple) else (heur,))
+
     def registerInitialState(self, state):
         """
         This is the first time that the agent sees the layout of the game
@@ -126,15 +171,64 @@ class SearchAgent(Agent):
         if self.searchFunction == None:
             raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
+        planKey = None
+        if getattr(self, "planCache", None) is not None:
+            planKey = plan_cache.plan_key(
+                state.data.layout.layoutText,
+                fingerprint=plan_cache.source_fingerprint(*self.planSources),
+                **self.planDescription
+            )
+            cached = self.planCache.get(planKey)
+            if cached is not None:
+                self.actions = cached["actions"]
+                print(
+                    "Cached path with total cost of %d found in %.1f seconds"
+                    % (cached["cost"], time.time() - starttime)
+                )
+                return
         problem = self.searchType(state)  # Makes a new search problem
-        self.actions = self.searchFunction(problem)  # Find a path
+        with profiling.phase("search"):
+            if getattr(self, "reportsStatistics", False):
+                statistics = search.SearchStatistics()
+                kwargs = {"observer": statistics}
+            else:
+                kwargs = {}
+            timeLimit = getattr(self, "timeLimit", None)
+            deadline = None
+            if timeLimit is not None:
+                deadline = starttime + timeLimit
+                if getattr(self, "takesDeadline", False):
+                    # Checked by the search itself on every expansion, so an expensive heuristic cannot overshoot it
+                    kwargs["deadline"] = deadline
+            try:
+                if deadline is not None and getattr(self, "takesSteps", False):
+                    steps = self.searchFunction(problem, steps=1000, **kwargs)
+                    self.actions = search.run_search_steps(steps, deadline=deadline, on_progress=self.searchProgress)
+                else:
+                    self.actions = self.searchFunction(problem, **kwargs)  # Find a path
+            except search.SearchBudgetExceeded as stopped:
+                print("Search cancelled at the %.1f second time limit after %d expansions" % (timeLimit, stopped.expanded))
+                raise
+        if getattr(self, "reportsStatistics", False):
+            print("Search nodes visited: %d" % statistics.expanded)
+            if statistics.winner is not None:
+                print("Plan found by %s" % statistics.winner)
         totalCost = problem.getCostOfActions(self.actions)
         print(
             "Path found with total cost of %d in %.1f seconds"
             % (totalCost, time.time() - starttime)
         )
+        if planKey is not None and self.actions is not None:
+            self.planCache.put(planKey, self.actions, totalCost, **self.planDescription)
         # if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
 
+    def searchProgress(self, progress):
+        """
+        Called with a search.SearchProgress every 1000 expansions of a search
+        with a time limit. Override it to show progress or redraw the display.
+        """
+        pass
+
     def getAction(self, state):
         """
         Returns the next action in the path chosen earlier (in
@@ -153,6 +247,11 @@ class SearchAgent(Agent):
             return Directions.STOP
 
 
+def unit_cost(position):
+    "The default cost function of a PositionSearchProblem: every step costs 1"
+    return 1
+
+
 class PositionSearchProblem(search.SearchSpace):
     """
     A search problem defines the state space, start state, goal test, successor
@@ -167,7 +266,7 @@ class PositionSearchProblem(search.SearchSpace):
     def __init__(
         self,
         gameState,
-        costFn=lambda x: 1,
+        costFn=unit_cost,
         goal=(1, 1),
         start=None,
         warn=True,
@@ -247,6 +346,33 @@ class PositionSearchProblem(search.SearchSpace):
 
         return successors
 
+    def get_predecessors(self, state):
+        """
+        Returns the positions from which state can be reached in one move, with
+        the action leading from each of them to state and its cost.
+        """
+        predecessors = []
+        x, y = state
+        cost = self.costFn(state)
+        for action in [
+            Directions.NORTH,
+            Directions.SOUTH,
+            Directions.EAST,
+            Directions.WEST,
+        ]:
+            dx, dy = Actions.directionToVector(action)
+            prevx, prevy = int(x - dx), int(y - dy)
+            if not self.walls[prevx][prevy]:
+                predecessors.append(((prevx, prevy), action, cost))
+        return predecessors
+
+    def get_goal_states(self):
+        return [self.goal]
+
+    def has_uniform_cost(self):
+        "True when every step costs 1, so grid-specific searches such as jump_point_search apply"
+        return self.costFn is unit_cost
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions. If those actions
@@ -316,15 +442,16 @@ def euclideanHeuristic(position, problem, info={}):
 
 
 def convert_original_game_state(state):
-    walls = state.getWalls()
-    food_positions = set()
-    wall_positions = set()
-    for x in range(walls.width):
-        for y in range(walls.height):
-            if walls.data[x][y]:
-                wall_positions.add((x, y))
-            if state.hasFood(x, y):
-                food_positions.add((x, y))
+    with profiling.phase("convert_original_game_state"):
+        walls = state.getWalls()
+        food_positions = set()
+        wall_positions = set()
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if walls.data[x][y]:
+                    wall_positions.add((x, y))
+                if state.hasFood(x, y):
+                    food_positions.add((x, y))
     return {
         "height": walls.height,
         "width": walls.width,
@@ -415,6 +542,21 @@ class FoodSearchProblem:
     def get_successors(self, state):
         return self.state_space.get_successors(state)
 
+    def get_successors_batch(self, states):
+        return self.state_space.get_successors_batch(states)
+
+    def encode(self, state):
+        return self.state_space.encode(state)
+
+    def decode(self, code):
+        return self.state_space.decode(code)
+
+    def state_count(self):
+        return self.state_space.state_count()
+
+    def greedy_plan(self):
+        return self.state_space.greedy_plan()
+
 
     def getCostOfActions(self, actions):
         """Returns the cost of a particular sequence of actions.  If those actions
@@ -432,15 +574,33 @@ class FoodSearchProblem:
 
 
 class AStarFoodSearchAgent(SearchAgent):
-    "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
+    """A SearchAgent for FoodSearchProblem using A* and your foodHeuristic
 
-    def __init__(self):
-        self.searchFunction = lambda prob: search.a_star_search(
-            prob, foodHeuristic
-        )
+    With timeLimit (seconds) set, e.g. -a timeLimit=25, it runs anytime A*
+    starting at the given weight instead, and plays the best plan found when
+    the time is up.
+    """
+
+    def __init__(self, timeLimit=None, weight=3.0):
+        if timeLimit is None:
+            self.searchFunction = lambda prob: search.a_star_search(
+                prob, foodHeuristic
+            )
+        else:
+            self.searchFunction = lambda prob: search.anytime_a_star_search(
+                prob,
+                foodHeuristic,
+                initial_weight=float(weight),
+                deadline=time.time() + float(timeLimit),
+            )
         self.searchType = FoodSearchProblem
 
 
+def foodHeuristicMST(state, problem):
+    """Length of a minimum spanning tree over Pacman and the remaining food, in maze distances."""
+    return food_heuristic_mst(state, problem.state_space)
+
+
 def foodHeuristic(state, problem):
     return food_heuristic(state, problem.state_space)
 
@@ -503,7 +663,7 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
         self.startState = gameState.getPacmanPosition()
-        self.costFn = lambda x: 1
+        self.costFn = unit_cost
         self._visited, self._visitedlist, self._expanded = {}, [], 0  # DO NOT CHANGE
 
     def is_final_state(self, state):
@@ -514,6 +674,9 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         x, y = state
         return state in self.food.asList()
 
+    def get_goal_states(self):
+        return self.food.asList()
+
 
 def mazeDistance(point1, point2, gameState):
     """
@@ -523,6 +686,8 @@ def mazeDistance(point1, point2, gameState):
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
+    Returns float("inf") when no path connects the two points.
+
     This might be a useful helper function for your ApproximateSearchAgent.
     """
     x1, y1 = point1
@@ -533,4 +698,5 @@ def mazeDistance(point1, point2, gameState):
     prob = PositionSearchProblem(
         gameState, start=point1, goal=point2, warn=False, visualize=False
     )
-    return len(search.bfs(prob))
+    distances = search.distance_map(prob, point1, targets=[point2])
+    return distances.get(point2, float("inf"))  # inf if no path found, as in PacmanFoodSearchSpace.get_distance